@@ -1,3 +1,5 @@
+import io
+
 ############
 #
 # Cheap Crowdfunding Problem
@@ -41,6 +43,168 @@ assert find_min_pledge([1, 2, 3]) == 4
 
 assert find_min_pledge([-1, -3]) == 1
 
+
+def find_min_pledge_vectorized(pledge_list):
+    """
+    Same answer as find_min_pledge, computed with NumPy in one pass:
+    with n pledges the answer is at most n + 1, so only amounts in
+    [1, n] need to be marked.
+    """
+    import numpy as np
+
+    pledges = np.asarray(pledge_list, dtype=np.int64)
+    seen = np.zeros(len(pledges) + 2, dtype=bool)
+    seen[0] = True
+    seen[pledges[(pledges > 0) & (pledges <= len(pledges))]] = True
+    # argmin returns the first False; index n + 1 is never marked
+    return int(np.argmin(seen))
+
+
+class PledgeTracker:
+    """
+    Answers find_min_pledge incrementally while pledges stream in.
+
+    Amounts are kept in a hierarchical bitmap of 64-bit words: bit i of
+    level 0 is set while amount i has been pledged, and bit j of each
+    level above is set while word j of the level below is full. add and
+    remove touch one word per level and min_pledge walks down the first
+    non-full word of each level, so every operation is O(log64(limit)),
+    i.e. 4 word operations for amounts below $1,000,000.
+    """
+
+    WORD_BITS = 64
+    FULL = (1 << 64) - 1
+
+    def __init__(self, pledge_list=(), limit=1000000):
+        from array import array
+
+        # Bit 0 stands for the invalid amount 0 and is always set, so the
+        # first clear bit is the answer
+        self.limit = limit
+        self._counts = array('I', bytes(4 * limit))
+        self._levels = []
+        size = limit
+        while True:
+            words = (size + self.WORD_BITS - 1) // self.WORD_BITS
+            level = array('Q', bytes(8 * words))
+            # Bits past the end are marked taken so a partial last word can fill up
+            if size % self.WORD_BITS:
+                level[-1] = self.FULL ^ ((1 << (size % self.WORD_BITS)) - 1)
+            self._levels.append(level)
+            if words == 1:
+                break
+            size = words
+        self._set(0)
+        for amount in pledge_list:
+            self.add(amount)
+
+    def _set(self, index):
+        for level in self._levels:
+            word, bit = divmod(index, self.WORD_BITS)
+            level[word] |= 1 << bit
+            if level[word] != self.FULL:
+                return
+            index = word
+
+    def _clear(self, index):
+        for level in self._levels:
+            word, bit = divmod(index, self.WORD_BITS)
+            was_full = level[word] == self.FULL
+            level[word] &= ~(1 << bit) & self.FULL
+            if not was_full:
+                return
+            index = word
+
+    def add(self, amount):
+        """Record a pledge; amounts <= 0 can never collide and are ignored."""
+        if amount <= 0:
+            return
+        if amount >= self.limit:
+            raise ValueError(f"Pledge {amount} is not below the limit {self.limit}")
+        self._counts[amount] += 1
+        if self._counts[amount] == 1:
+            self._set(amount)
+
+    def remove(self, amount):
+        """Withdraw one earlier pledge of `amount`."""
+        if amount <= 0:
+            return
+        if amount >= self.limit or self._counts[amount] == 0:
+            raise KeyError(amount)
+        self._counts[amount] -= 1
+        if self._counts[amount] == 0:
+            self._clear(amount)
+
+    def min_pledge(self):
+        """The least positive amount nobody has pledged yet."""
+        index = 0
+        for level in reversed(self._levels):
+            word = level[index]
+            if word == self.FULL:
+                # Only the top word can be full here: every amount is taken
+                return self.limit
+            # Lowest clear bit of the word
+            index = index * self.WORD_BITS + ((~word & (word + 1)).bit_length() - 1)
+        return index
+
+
+def benchmark_find_min_pledge(pledges=100000, arrivals=2000, seed=42):
+    """
+    Compare find_min_pledge with the vectorized and incremental versions.
+    Not run on import: call benchmark_find_min_pledge() to print timings.
+    """
+    import random
+    import time
+
+    rng = random.Random(seed)
+    # Dense low amounts make the upward probe walk far, like real pledges
+    pledge_list = [rng.randint(1, pledges) for _ in range(pledges)]
+    results = {}
+
+    start = time.perf_counter()
+    expected = find_min_pledge(pledge_list)
+    results['find_min_pledge (one list)'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    assert find_min_pledge_vectorized(pledge_list) == expected
+    results['find_min_pledge_vectorized (one list)'] = time.perf_counter() - start
+
+    # Streaming: answer after every arrival. Recomputing from scratch is
+    # quadratic, so it is only timed over the first `arrivals` pledges
+    start = time.perf_counter()
+    for i in range(1, arrivals + 1):
+        find_min_pledge(pledge_list[:i])
+    results[f'find_min_pledge per arrival ({arrivals})'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tracker = PledgeTracker()
+    for amount in pledge_list:
+        tracker.add(amount)
+        tracker.min_pledge()
+    results[f'PledgeTracker per arrival ({pledges})'] = time.perf_counter() - start
+    assert tracker.min_pledge() == expected
+
+    for name, seconds in results.items():
+        print(f"{name}: {seconds * 1000:.1f} ms")
+    return results
+
+
+assert find_min_pledge_vectorized([1, 3, 6, 4, 1, 2]) == 5
+assert find_min_pledge_vectorized([1, 2, 3]) == 4
+assert find_min_pledge_vectorized([-1, -3]) == 1
+assert find_min_pledge_vectorized([]) == 1
+
+_tracker = PledgeTracker([1, 3, 6, 4, 1, 2])
+assert _tracker.min_pledge() == 5
+_tracker.add(5)
+assert _tracker.min_pledge() == 7
+_tracker.remove(1)
+assert _tracker.min_pledge() == 7  # 1 was pledged twice
+_tracker.remove(1)
+assert _tracker.min_pledge() == 1
+assert PledgeTracker([-1, -3]).min_pledge() == 1
+assert PledgeTracker(range(1, 64 * 64 + 5), limit=64 * 64 + 5).min_pledge() == 64 * 64 + 5
+
 ############
 #
 # Extract Titles from RSS feed
@@ -86,6 +250,157 @@ def get_headlines(rss_url):
 print(get_headlines(google_news_url))
 
 
+class FeedCache:
+    """
+    Remembers each feed's validators and titles so the next poll can be a
+    conditional request (If-None-Match / If-Modified-Since) and a
+    304 Not Modified answer can reuse the titles parsed last time.
+    """
+
+    def __init__(self):
+        import threading
+
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, url):
+        with self._lock:
+            return self._entries.get(url)
+
+    def put(self, url, etag, last_modified, titles):
+        with self._lock:
+            self._entries[url] = {'etag': etag, 'last_modified': last_modified, 'titles': titles}
+
+    def request_headers(self, url):
+        entry = self.get(url)
+        headers = {}
+        if entry and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+
+def parse_headlines(stream):
+    """
+    Extract item titles from an RSS document read incrementally from the
+    file-like `stream`, clearing each item once its title is taken so
+    memory stays flat on large feeds.
+    """
+    import xml.etree.ElementTree as ET
+
+    titles = []
+    open_elements = []
+    for event, element in ET.iterparse(stream, events=('start', 'end')):
+        if event == 'start':
+            open_elements.append(element)
+            continue
+        open_elements.pop()
+        if element.tag == 'item':
+            title = element.findtext('title')
+            if title and title.strip():
+                titles.append(title.strip())
+            # Detach the finished item so the tree never holds more than one
+            if open_elements:
+                open_elements[-1].remove(element)
+    return titles
+
+
+def fetch_headlines(rss_urls, max_workers=16, timeout=10, cache=None):
+    """
+    Fetch many RSS feeds concurrently on a bounded thread pool.
+
+    @returns a dict mapping each url to {'titles', 'status', 'cached',
+    'elapsed_ms', 'error'}; a failing feed reports its error instead of
+    aborting the others. With a FeedCache, unchanged feeds are answered
+    from the cache after a 304 response.
+    """
+    import time
+    import urllib.error
+    import urllib.request
+    from concurrent.futures import ThreadPoolExecutor
+
+    def fetch(url):
+        start = time.perf_counter()
+        result = {'titles': [], 'status': None, 'cached': False, 'elapsed_ms': None, 'error': None}
+        headers = cache.request_headers(url) if cache else {}
+        try:
+            request = urllib.request.Request(url, headers=headers)
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                result['status'] = response.status
+                result['titles'] = parse_headlines(response)
+                if cache:
+                    cache.put(url, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                              result['titles'])
+        except urllib.error.HTTPError as e:
+            result['status'] = e.code
+            entry = cache.get(url) if cache else None
+            if e.code == 304 and entry:
+                result['titles'] = entry['titles']
+                result['cached'] = True
+            else:
+                result['error'] = f"HTTP {e.code}: {e.reason}"
+        except Exception as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+        result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return url, result
+
+    rss_urls = list(dict.fromkeys(rss_urls))
+    if not rss_urls:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(rss_urls))) as pool:
+        return dict(pool.map(fetch, rss_urls))
+
+
+def _check_fetch_headlines():
+    """Exercise fetch_headlines against a local stand-in feed server."""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    feed = (b'<?xml version="1.0"?><rss version="2.0"><channel><title>Local</title>'
+            + b''.join(b'<item><title> Story %d </title></item>' % i for i in range(3))
+            + b'</channel></rss>')
+    requests_seen = []
+
+    class FeedHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append((self.path, self.headers.get('If-None-Match')))
+            if self.path != '/feed.xml':
+                self.send_error(404)
+            elif self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+            else:
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/rss+xml')
+                self.send_header('ETag', '"v1"')
+                self.send_header('Content-Length', str(len(feed)))
+                self.end_headers()
+                self.wfile.write(feed)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FeedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        cache = FeedCache()
+        first = fetch_headlines([base + '/feed.xml', base + '/missing.xml'], cache=cache)
+        assert first[base + '/feed.xml']['titles'] == ['Story 0', 'Story 1', 'Story 2']
+        assert first[base + '/feed.xml']['status'] == 200
+        assert first[base + '/missing.xml']['status'] == 404
+        assert first[base + '/missing.xml']['error'].startswith('HTTP 404')
+
+        second = fetch_headlines([base + '/feed.xml'], cache=cache)[base + '/feed.xml']
+        assert second['status'] == 304 and second['cached']
+        assert second['titles'] == ['Story 0', 'Story 1', 'Story 2']
+        assert requests_seen[-1] == ('/feed.xml', '"v1"')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
 ############
 #
 # Streaming Payments Processor
@@ -144,35 +459,235 @@ def stream_payments_to_storage(storage):
         storage.write(bytes([1, 2, 3, 4, 5]))
 
 
+class ByteSum:
+    """Arithmetic sum of all bytes, vectorized with NumPy when available."""
+
+    name = 'sum'
+
+    def __init__(self):
+        self.value = 0
+        try:
+            import numpy
+            self._np = numpy
+        except ImportError:
+            self._np = None
+
+    def update(self, data):
+        if self._np is None:
+            self.value += sum(data)
+            return
+        np = self._np
+        values = np.frombuffer(data, dtype=np.uint8)
+        # Adding 256 bytes column-wise fits a uint16 (256 * 255 < 2**16),
+        # which is much faster than widening every byte to 64 bits
+        whole = len(values) - len(values) % 256
+        if whole:
+            columns = values[:whole].reshape(256, -1).sum(axis=0, dtype=np.uint16)
+            self.value += int(columns.sum(dtype=np.uint64))
+        if whole < len(values):
+            self.value += int(values[whole:].sum(dtype=np.uint64))
+
+    def result(self):
+        return self.value
+
+
+class CRC32:
+    name = 'crc32'
+
+    def __init__(self):
+        import zlib
+        self._crc32 = zlib.crc32
+        self.value = 0
+
+    def update(self, data):
+        self.value = self._crc32(data, self.value)
+
+    def result(self):
+        return self.value
+
+
+class Adler32:
+    name = 'adler32'
+
+    def __init__(self):
+        import zlib
+        self._adler32 = zlib.adler32
+        self.value = 1
+
+    def update(self, data):
+        self.value = self._adler32(data, self.value)
+
+    def result(self):
+        return self.value
+
+
+class SHA256:
+    name = 'sha256'
+
+    def __init__(self):
+        import hashlib
+        self._hash = hashlib.sha256()
+
+    def update(self, data):
+        self._hash.update(data)
+
+    def result(self):
+        return self._hash.hexdigest()
+
+
+CHECKSUMS = {digest.name: digest for digest in (ByteSum, CRC32, Adler32, SHA256)}
+
+
+class ChecksumWriter(io.RawIOBase):
+    """
+    Write-only stream that checksums every buffer written to it and
+    passes it on to `storage` unchanged.
+
+    Buffers are viewed through a memoryview, never copied, and each
+    digest consumes them with a C-level routine (NumPy, zlib, hashlib).
+    Being an io.RawIOBase it supports the usual stream protocol (write,
+    writelines, flush, close, context manager) and can itself be wrapped
+    in an io.BufferedWriter. Closing it flushes but does not close
+    `storage`, which belongs to the caller.
+
+    Each entry of `checksums` is a name from CHECKSUMS, a digest object
+    with update() and digest() (e.g. hashlib.md5()), or a callable that
+    returns one (e.g. hashlib.blake2b).
+    """
+
+    def __init__(self, storage, checksums=('sum',)):
+        super().__init__()
+        self.storage = storage
+        self.bytes_written = 0
+        self._digests = [self._make_digest(spec) for spec in checksums]
+
+    @staticmethod
+    def _make_digest(spec):
+        if isinstance(spec, str):
+            return CHECKSUMS[spec]()
+        digest = spec() if callable(spec) else spec
+        if not callable(getattr(digest, 'update', None)) or not (
+                hasattr(digest, 'result') or hasattr(digest, 'digest')):
+            raise TypeError(f"{spec!r} is not a checksum name, digest or digest factory")
+        return digest
+
+    def writable(self):
+        return True
+
+    def write(self, buffer):
+        self._checkClosed()
+        view = memoryview(buffer).cast('B')
+        for digest in self._digests:
+            digest.update(view)
+        # BufferedWriter.write either takes the whole buffer or raises
+        self.storage.write(view)
+        self.bytes_written += len(view)
+        return len(view)
+
+    def flush(self):
+        if not self.closed:
+            self.storage.flush()
+
+    def checksums(self):
+        """
+        @returns a dict of digest name to its value over everything written so far,
+                 from result() or, for digests without one, digest()
+        """
+        return {
+            getattr(digest, 'name', type(digest).__name__):
+                digest.result() if hasattr(digest, 'result') else digest.digest()
+            for digest in self._digests
+        }
+
+
 def process_payments():
     """
     Store payments streamed by `stream_payments_to_storage` and
     print the checksum of payments stored
     """
-    original_storage = get_payments_storage()
-    checksum = 0
-    
-    # Create a storage object with a custom write method
-    class ChecksumWrapper:
-        def __init__(self, storage):
-            self.storage = storage
-            self.checksum = 0
-        
-        def write(self, buffer):
-            # Add bytes to checksum
-            self.checksum += sum(buffer)
-            # Write to original storage
-            return self.storage.write(buffer)
-    
-    wrapper = ChecksumWrapper(original_storage)
-    stream_payments_to_storage(wrapper)
-    
-    print(wrapper.checksum)
+    storage = get_payments_storage()
+    with ChecksumWriter(storage) as writer:
+        stream_payments_to_storage(writer)
+        print(writer.checksums()['sum'])
 
 
 process_payments()
 
 
+def benchmark_checksum_writer(total_mb=1024, chunk_kb=1024, checksums=('sum', 'crc32', 'adler32', 'sha256')):
+    """
+    Push `total_mb` of random data through ChecksumWriter into /dev/null
+    with each digest and print the throughput in GB/s. Not run on import.
+    """
+    import os
+    import time
+
+    chunk = os.urandom(chunk_kb * 1024)
+    chunks = total_mb * 1024 // chunk_kb
+    results = {}
+    for name in ('passthrough',) + tuple(checksums):
+        with open(os.devnull, 'wb') as storage:
+            with ChecksumWriter(storage, checksums=() if name == 'passthrough' else (name,)) as writer:
+                start = time.perf_counter()
+                for _ in range(chunks):
+                    writer.write(chunk)
+                elapsed = time.perf_counter() - start
+        results[name] = writer.bytes_written / elapsed / 1e9
+
+    # The old per-byte Python sum, over a slice to keep the run short
+    sample = max(1, chunks // 64)
+    start = time.perf_counter()
+    for _ in range(sample):
+        sum(chunk)
+    results['sum (python loop)'] = sample * len(chunk) / (time.perf_counter() - start) / 1e9
+
+    for name, rate in results.items():
+        print(f"{name}: {rate:.2f} GB/s")
+    return results
+
+
+def _check_checksum_writer():
+    import array
+    import hashlib
+    import zlib
+
+    sink = io.BytesIO()
+    data = bytes(range(256)) * 40 + b'\x01\x02\x03'
+    with ChecksumWriter(sink, checksums=tuple(CHECKSUMS)) as writer:
+        writer.write(data[:1000])
+        writer.writelines([memoryview(data)[1000:5000], bytearray(data[5000:])])
+        writer.write(array.array('H', [0x0102]))
+        sums = writer.checksums()
+    expected = data + array.array('H', [0x0102]).tobytes()
+    assert sink.getvalue() == expected
+    assert writer.closed and not sink.closed
+    assert sums == {
+        'sum': sum(expected),
+        'crc32': zlib.crc32(expected),
+        'adler32': zlib.adler32(expected),
+        'sha256': hashlib.sha256(expected).hexdigest(),
+    }
+
+    # hashlib-style digests, given as objects or factories, report digest()
+    with ChecksumWriter(io.BytesIO(), checksums=('crc32', hashlib.md5(), hashlib.blake2b)) as writer:
+        writer.write(data)
+    assert writer.checksums() == {
+        'crc32': zlib.crc32(data),
+        'md5': hashlib.md5(data).digest(),
+        'blake2b': hashlib.blake2b(data).digest(),
+    }
+    try:
+        ChecksumWriter(io.BytesIO(), checksums=(object(),))
+        raise AssertionError("expected TypeError")
+    except TypeError:
+        pass
+
+    fallback = ByteSum()
+    fallback._np = None
+    fallback.update(memoryview(data))
+    assert fallback.result() == sum(data)
+
+
 ############
 # Streaming Payments Processor, two vendors edition.
 #
@@ -229,31 +744,218 @@ def callback_example(amount):
     return True
 
 
+class StreamCancelled(Exception):
+    """Raised inside the producer's callback once the consumer has stopped iterating."""
+
+
+class CallbackIterator:
+    """
+    Turns a push-style producer, `producer(callback_fn)`, into an iterator.
+
+    The producer runs on a worker thread and its callback puts values into
+    a bounded queue, blocking while the queue is full, so at most about
+    `capacity` values are in memory however long the stream is. With
+    `batch_size` > 1 values cross the queue in lists of that size, which
+    amortizes the thread hand-off; iteration still yields single values.
+    `batch_size` may not exceed `capacity`.
+
+    An exception raised by the producer is re-raised from the consumer's
+    next(). Closing the iterator (or leaving its `with` block) before the
+    stream ends makes the next callback raise StreamCancelled in the
+    producer and waits for the worker thread to finish.
+    """
+
+    _DONE = object()
+
+    def __init__(self, producer, capacity=1024, batch_size=1):
+        import queue
+        import threading
+
+        if capacity < 1 or batch_size < 1:
+            raise ValueError("capacity and batch_size must be at least 1")
+        if batch_size > capacity:
+            raise ValueError("batch_size must not exceed capacity")
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=capacity // batch_size)
+        self._cancelled = threading.Event()
+        self._batch = iter(())
+        self._finished = False
+        self._thread = threading.Thread(target=self._run, args=(producer,), daemon=True)
+        self._thread.start()
+
+    def _run(self, producer):
+        pending = []
+
+        def callback(value):
+            if self._cancelled.is_set():
+                raise StreamCancelled()
+            pending.append(value)
+            if len(pending) >= self.batch_size:
+                self._queue.put(pending.copy())
+                pending.clear()
+
+        try:
+            producer(callback)
+            if pending:
+                self._queue.put(pending)
+            outcome = self._DONE
+        except BaseException as e:
+            outcome = e
+        if not self._cancelled.is_set():
+            self._queue.put(outcome)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        for value in self._batch:
+            return value
+        if self._finished:
+            raise StopIteration
+        item = self._queue.get()
+        if item is self._DONE or isinstance(item, BaseException):
+            self._finished = True
+            self._thread.join()
+            if item is self._DONE:
+                raise StopIteration
+            raise item
+        self._batch = iter(item)
+        return next(self._batch)
+
+    def close(self):
+        """Stop the producer early and wait for its thread to exit."""
+        import queue
+
+        if self._finished:
+            return
+        self._finished = True
+        self._cancelled.set()
+        # Free queue slots until the worker is gone so a blocked put() can
+        # return and the producer's next callback sees the cancellation
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.05)
+            except queue.Empty:
+                pass
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
 def process_payments_2():
     """
     Read streamed payments and store them
     """
-    # Collect all payments using the callback
-    payments = []
-    
-    def payment_callback(amount):
-        payments.append(amount)
-    
-    # Stream all payments first
-    stream_payments(payment_callback)
-    
-    # Create an iterator from the collected payments
-    def payment_iterator():
-        for payment in payments:
-            yield payment
-    
-    # Store the payments using the iterator
-    store_payments(payment_iterator())
+    # stream_payments pushes into a bounded queue on a worker thread while
+    # store_payments pulls from it, so only a window of payments is in memory
+    with CallbackIterator(stream_payments, capacity=1024, batch_size=64) as payments:
+        store_payments(payments)
 
 
 process_payments_2()
 
 
+def benchmark_callback_iterator(payments=10000000, batch_sizes=(1, 64, 1024), capacity=8192):
+    """
+    Stream `payments` values through CallbackIterator and through the old
+    collect-into-a-list approach, printing payments/s and peak traced
+    memory for each. Not run on import; tracemalloc runs are separate from
+    the timed runs so they do not skew throughput.
+    """
+    import time
+    import tracemalloc
+
+    def producer(callback_fn):
+        for i in range(payments):
+            callback_fn(i)
+
+    def consume(amount_iterator):
+        total = 0
+        for amount in amount_iterator:
+            total += amount
+        return total
+
+    def collect_into_list():
+        collected = []
+        producer(collected.append)
+        return consume(iter(collected))
+
+    def bridged(batch_size):
+        with CallbackIterator(producer, capacity=capacity, batch_size=batch_size) as amounts:
+            return consume(amounts)
+
+    runs = {'list (previous process_payments_2)': collect_into_list}
+    for batch_size in batch_sizes:
+        runs[f'CallbackIterator batch_size={batch_size}'] = (lambda size: lambda: bridged(size))(batch_size)
+
+    expected = payments * (payments - 1) // 2
+    results = {}
+    for name, run in runs.items():
+        start = time.perf_counter()
+        assert run() == expected
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = {'payments_per_second': payments / elapsed, 'peak_mb': peak / 2 ** 20}
+        print(f"{name}: {payments / elapsed:,.0f} payments/s, peak {peak / 2 ** 20:.1f} MiB")
+    return results
+
+
+def _check_callback_iterator():
+    import threading
+
+    for batch_size in (1, 3, 4):
+        with CallbackIterator(lambda cb: [cb(i) for i in range(10)], capacity=4, batch_size=batch_size) as it:
+            assert list(it) == list(range(10))
+
+    # A batch larger than the capacity would buffer more than `capacity` values
+    try:
+        CallbackIterator(lambda cb: None, capacity=4, batch_size=5)
+        raise AssertionError("expected ValueError")
+    except ValueError:
+        pass
+
+    # Producer errors surface in the consumer after the values before them
+    def failing(callback_fn):
+        callback_fn(1)
+        raise RuntimeError("payment processor went away")
+
+    received = []
+    try:
+        for amount in CallbackIterator(failing):
+            received.append(amount)
+        raise AssertionError("expected RuntimeError")
+    except RuntimeError as e:
+        assert str(e) == "payment processor went away"
+    assert received == [1]
+
+    # Stopping early cancels an endless producer and applies backpressure
+    produced = []
+    stopped = threading.Event()
+
+    def endless(callback_fn):
+        try:
+            i = 0
+            while True:
+                callback_fn(i)
+                produced.append(i)
+                i += 1
+        except StreamCancelled:
+            stopped.set()
+            raise
+
+    with CallbackIterator(endless, capacity=8) as it:
+        assert [next(it) for _ in range(5)] == [0, 1, 2, 3, 4]
+    assert stopped.is_set()
+    assert len(produced) <= 5 + 8 + 1
+
+
 ############
 #
 # Code Review
@@ -373,3 +1075,9 @@ def config_from_dict(dict):
              "namespace": namespace
              }
             )
+
+
+if __name__ == "__main__":
+    _check_fetch_headlines()
+    _check_checksum_writer()
+    _check_callback_iterator()
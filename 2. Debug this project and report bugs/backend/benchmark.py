@@ -0,0 +1,347 @@
+"""In-process benchmark of the upload, dashboard, transactions and copilot endpoints.
+
+Generates a seeded synthetic transactions CSV, runs the app against a temporary
+SQLite database and prints throughput, latency percentiles and peak memory as
+JSON, so runs can be compared across commits, e.g.:
+
+    python benchmark.py --rows 1000000 --output bench-1m.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from loadtest import percentile
+
+# (description, store-number suffix, min amount, max amount, relative frequency);
+# every merchant hits a default category keyword except the transfers, which land in "Other"
+MERCHANTS = [
+    ("Whole Foods Market", True, -250.0, -12.0, 8),
+    ("Trader Joe's", True, -180.0, -9.0, 6),
+    ("Safeway Grocery", True, -160.0, -8.0, 5),
+    ("Starbucks Coffee", True, -14.0, -3.5, 12),
+    ("Chipotle Mexican Grill Restaurant", True, -32.0, -9.0, 5),
+    ("Domino's Pizza", True, -45.0, -12.0, 4),
+    ("Shell Gas Station", True, -90.0, -25.0, 6),
+    ("Chevron Fuel", True, -95.0, -30.0, 4),
+    ("Amazon Marketplace", False, -400.0, -5.0, 10),
+    ("Target Store", True, -220.0, -10.0, 4),
+    ("PG&E Electric Bill", False, -260.0, -60.0, 1),
+    ("Comcast Internet", False, -120.0, -60.0, 1),
+    ("Uber Trip", False, -65.0, -6.0, 7),
+    ("Lyft Ride", False, -55.0, -6.0, 4),
+    ("City Parking Garage", True, -40.0, -4.0, 3),
+    ("Netflix Subscription", False, -22.99, -9.99, 1),
+    ("Spotify Premium", False, -16.99, -9.99, 1),
+    ("AMC Movie Theater", True, -60.0, -12.0, 2),
+    ("CVS Pharmacy", True, -85.0, -4.0, 4),
+    ("Kaiser Medical Center", False, -400.0, -25.0, 1),
+    ("Payroll Salary Deposit", False, 2500.0, 7500.0, 2),
+    ("Venmo Transfer", False, -300.0, 300.0, 3),
+]
+
+COPILOT_QUESTIONS = [
+    "How much did I spend on groceries?",
+    "How much did I spend on coffee last month?",
+    "What was my biggest purchase?",
+    "What was my biggest purchase in december?",
+    "How many Uber transactions did I have?",
+    "Give me a summary of this month",
+]
+
+def generate_csv(path: str, rows: int, seed: int = 42, start: str = "2022-01-01", days: int = 730,
+                 chunk_rows: int = 1_000_000):
+    """Write `rows` synthetic transactions to `path`; the same seed always produces the same file."""
+    rng = np.random.default_rng(seed)
+    names = np.array([name for name, *_ in MERCHANTS], dtype=object)
+    numbered = np.array([numbered for _, numbered, *_ in MERCHANTS])
+    low = np.array([low for _, _, low, _, _ in MERCHANTS])
+    high = np.array([high for _, _, _, high, _ in MERCHANTS])
+    weights = np.array([weight for *_, weight in MERCHANTS], dtype=float)
+    weights /= weights.sum()
+    start_day = np.datetime64(start, "D")
+
+    with open(path, "w", newline="") as out:
+        written = 0
+        while written < rows:
+            size = min(chunk_rows, rows - written)
+            merchant = rng.choice(len(MERCHANTS), size=size, p=weights)
+            descriptions = pd.Series(names[merchant])
+            stores = pd.Series(rng.integers(1, 1000, size=size)).astype(str)
+            descriptions = descriptions.where(~numbered[merchant], descriptions + " #" + stores)
+            frame = pd.DataFrame({
+                "date": np.datetime_as_string(start_day + rng.integers(0, days, size=size), unit="D"),
+                "description": descriptions,
+                "amount": rng.uniform(low[merchant], high[merchant]).round(2),
+            })
+            frame.to_csv(out, header=written == 0, index=False)
+            written += size
+
+class InProcessClient:
+    """Minimal synchronous ASGI client: drives the app on a private event loop, no sockets."""
+
+    def __init__(self, app):
+        self.app = app
+        self.loop = asyncio.new_event_loop()
+
+    def __enter__(self) -> "InProcessClient":
+        self.loop.run_until_complete(self.app.router.startup())
+        return self
+
+    def __exit__(self, *exc_info):
+        self.loop.run_until_complete(self.app.router.shutdown())
+        self.loop.close()
+
+    def request(self, method: str, url: str, body: Union[bytes, Iterable[bytes]] = b"",
+                headers: Optional[Dict[str, str]] = None, content_length: Optional[int] = None) -> Tuple[int, bytes]:
+        """Send one request; `body` may be an iterable of chunks (with `content_length`) to stream it."""
+        if isinstance(body, bytes):
+            content_length = len(body)
+            body = [body]
+        parts = urlsplit(url)
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": parts.path,
+            "raw_path": parts.path.encode(),
+            "query_string": parts.query.encode(),
+            "root_path": "",
+            "headers": [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()]
+                       + [(b"content-length", str(content_length).encode())],
+            "server": ("benchmark", 80),
+            "client": ("127.0.0.1", 0),
+        }
+        status = []
+        chunks = []
+        body_chunks = iter(body)
+        pending = next(body_chunks, b"")
+        request_sent = False
+
+        async def receive():
+            nonlocal pending, request_sent
+            if not request_sent:
+                chunk, pending = pending, next(body_chunks, None)
+                request_sent = pending is None
+                return {"type": "http.request", "body": chunk, "more_body": not request_sent}
+            # Only streaming responses listen past the request; never disconnect
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                status.append(message["status"])
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        self.loop.run_until_complete(self.app(scope, receive, send))
+        return status[0], b"".join(chunks)
+
+    def get(self, url: str) -> Tuple[int, bytes]:
+        return self.request("GET", url)
+
+    def post_json(self, url: str, payload: dict) -> Tuple[int, bytes]:
+        return self.request("POST", url, json.dumps(payload).encode(), {"content-type": "application/json"})
+
+    def post_file(self, url: str, path: str, chunk_size: int = 1024 * 1024) -> Tuple[int, bytes]:
+        """Upload the file at `path` as multipart form data, read and sent `chunk_size` bytes at a time."""
+        boundary = "benchmark-boundary"
+        head = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{os.path.basename(path)}"\r\n'
+            "Content-Type: text/csv\r\n\r\n"
+        ).encode()
+        tail = f"\r\n--{boundary}--\r\n".encode()
+
+        def body():
+            yield head
+            with open(path, "rb") as f:
+                yield from iter(lambda: f.read(chunk_size), b"")
+            yield tail
+
+        return self.request(
+            "POST", url, body(), {"content-type": f"multipart/form-data; boundary={boundary}"},
+            content_length=len(head) + os.path.getsize(path) + len(tail)
+        )
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process so far, in MiB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def current_rss_mb() -> Optional[float]:
+    """Current resident set size of this process in MiB (Linux only, else None)."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return round(resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Read scenarios: (method, path, JSON body) cycled through by time_requests
+SCENARIOS = {
+    "dashboard_summary": [("GET", "/api/dashboard/summary", None)],
+    "transactions_page": [("GET", "/api/transactions?limit=100", None)],
+    "transactions_filtered": [
+        ("GET", "/api/transactions?limit=100&category_id=1", None),
+        ("GET", "/api/transactions?limit=100&min_amount=-20&max_amount=0", None),
+    ],
+    "copilot_query": [("POST", "/api/copilot/query", {"question": question}) for question in COPILOT_QUESTIONS],
+}
+
+def time_requests(client: InProcessClient, calls: List[Tuple[str, str, Optional[dict]]], iterations: int,
+                  clear_caches: Optional[Callable[[], None]] = None) -> Dict:
+    """Issue `iterations` requests cycling through `calls` and summarize their latency (ms)."""
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    for i in range(iterations):
+        if clear_caches:
+            clear_caches()
+        method, path, payload = calls[i % len(calls)]
+        began = time.perf_counter()
+        status, _ = client.post_json(path, payload) if method == "POST" else client.get(path)
+        latencies.append((time.perf_counter() - began) * 1000)
+        errors += status >= 400
+    wall = time.perf_counter() - start
+    return {
+        "requests": iterations,
+        "errors": errors,
+        "requests_per_second": round(iterations / wall, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies), 2),
+    }
+
+def _open_app(workdir: str):
+    """Import the app against the benchmark database in `workdir`; must run before anything imports models."""
+    os.environ["SQLITE_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+    os.environ.setdefault("UPLOAD_SPOOL_DIR", os.path.join(workdir, "uploads"))
+    import main
+    return main.app
+
+def _upload_phase(workdir: str, csv_path: str) -> Dict:
+    with InProcessClient(_open_app(workdir)) as client:
+        baseline = current_rss_mb()
+        began = time.perf_counter()
+        status, body = client.post_file("/api/transactions/upload?background=false&stream=true", csv_path)
+        elapsed = time.perf_counter() - began
+    upload = json.loads(body)
+    if status != 200:
+        raise RuntimeError(f"Upload failed with {status}: {upload}")
+    return {
+        "rows": upload["accepted"],
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(upload["accepted"] / elapsed, 1),
+        "timings_ms": upload.get("timings"),
+        "rss_baseline_mb": baseline,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def _scenario_phase(workdir: str, name: str, iterations: int, cold: bool) -> Dict:
+    app = _open_app(workdir)
+    from http_cache import response_cache
+    from services import copilot_cache
+
+    def clear_caches():
+        response_cache._bodies.clear()
+        copilot_cache.clear()
+
+    with InProcessClient(app) as client:
+        baseline = current_rss_mb()
+        result = time_requests(client, SCENARIOS[name], iterations, clear_caches if cold else None)
+    result.update(rss_baseline_mb=baseline, peak_rss_mb=peak_rss_mb())
+    return result
+
+def _in_fresh_process(phase: Callable, *args) -> Dict:
+    """Run `phase(*args)` in a new interpreter, so its peak RSS covers that phase alone."""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(phase, *args).result()
+
+def run(rows: int, seed: int, iterations: int, workdir: str, csv_path: Optional[str] = None,
+        cold: bool = False) -> Dict:
+    """Benchmark a fresh database in `workdir`.
+
+    The upload and every read scenario run in their own spawned process, so each
+    reports its own peak RSS (next to the RSS right after app startup) instead of
+    the peak of the whole run.
+    """
+    results = {}
+    if csv_path is None:
+        csv_path = os.path.join(workdir, "transactions.csv")
+        began = time.perf_counter()
+        generate_csv(csv_path, rows, seed=seed)
+        results["generate"] = {"seconds": round(time.perf_counter() - began, 2), "bytes": os.path.getsize(csv_path)}
+
+    results["upload"] = _in_fresh_process(_upload_phase, workdir, csv_path)
+    for name in SCENARIOS:
+        results[name] = _in_fresh_process(_scenario_phase, workdir, name, iterations, cold)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000, help="synthetic rows to generate (10k-10M)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=200, help="requests per read scenario")
+    parser.add_argument("--csv", help="benchmark this CSV instead of generating one")
+    parser.add_argument("--cold", action="store_true",
+                        help="clear the in-process response and copilot caches before every request")
+    parser.add_argument("--generate-only", metavar="PATH", help="only write the synthetic CSV to PATH")
+    parser.add_argument("--output", help="write the JSON report to this file as well as stdout")
+    args = parser.parse_args()
+
+    if args.generate_only:
+        generate_csv(args.generate_only, args.rows, seed=args.seed)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="finance-benchmark-") as workdir:
+        results = run(args.rows, args.seed, args.iterations, workdir, csv_path=args.csv, cold=args.cold)
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "rows": args.rows if args.csv is None else None,
+        "seed": args.seed,
+        "iterations": args.iterations,
+        "cold": args.cold,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+if __name__ == "__main__":
+    main()
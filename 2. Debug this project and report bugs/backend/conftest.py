@@ -0,0 +1,89 @@
+"""Shared test setup: the app against a scratch SQLite database.
+
+Run from this directory with `python -m pytest -q`.
+"""
+import os
+import tempfile
+import time
+from typing import Union
+
+import pytest
+
+_workdir = tempfile.TemporaryDirectory(prefix="finance-test-")
+# The engine is created when models is imported, so point it at a scratch database first
+os.environ["SQLITE_DATABASE_URL"] = f"sqlite:///{os.path.join(_workdir.name, 'test.db')}"
+os.environ["UPLOAD_SPOOL_DIR"] = os.path.join(_workdir.name, "uploads")
+os.environ["METRICS_ENABLED"] = "False"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+from http_cache import response_cache  # noqa: E402
+from models import SessionLocal, MonthlyCategoryRollup, Transaction, UploadedFile, UploadJob  # noqa: E402
+from services import RollupService, copilot_cache  # noqa: E402
+
+SAMPLE_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "sample_transactions.csv")
+
+@pytest.fixture(scope="session")
+def app_client():
+    with TestClient(main.app) as client:
+        yield client
+
+@pytest.fixture
+def client(app_client):
+    """A client over empty transaction tables and cold caches."""
+    clear_data()
+    yield app_client
+
+def clear_data():
+    """Delete every transaction, rollup bucket, upload record and job, and empty the caches."""
+    db = SessionLocal()
+    try:
+        for model in (Transaction, MonthlyCategoryRollup, UploadedFile, UploadJob):
+            db.query(model).delete()
+        db.commit()
+    finally:
+        db.close()
+    response_cache._bodies.clear()
+    copilot_cache.clear()
+
+def upload(client, content: Union[str, bytes], filename: str = "transactions.csv", **params):
+    """POST `content` as a CSV upload; processed inline unless `background=True` is passed."""
+    params.setdefault("background", False)
+    if isinstance(content, str):
+        content = content.encode()
+    return client.post(
+        "/api/transactions/upload",
+        params={key: str(value).lower() if isinstance(value, bool) else value for key, value in params.items()},
+        files={"file": (filename, content, "text/csv")}
+    )
+
+def wait_for_job(client, job_id: str, timeout: float = 10.0) -> dict:
+    """Poll an upload job until it completes or fails (or `timeout` seconds pass)."""
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/api/jobs/{job_id}").json()
+        if job["status"] in ("completed", "failed") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.05)
+
+def rollup_rows():
+    """The rollup table as {(year, month, category_id): (total, count)}, for comparing against a rebuild."""
+    db = SessionLocal()
+    try:
+        return {
+            (row.year, row.month, row.category_id): (round(row.total_amount, 2), row.transaction_count)
+            for row in db.query(MonthlyCategoryRollup)
+        }
+    finally:
+        db.close()
+
+def assert_rollup_consistent():
+    """The incrementally maintained rollup must equal one rebuilt from the transactions table."""
+    maintained = rollup_rows()
+    db = SessionLocal()
+    try:
+        RollupService(db).rebuild()
+    finally:
+        db.close()
+    assert maintained == rollup_rows()
@@ -0,0 +1,106 @@
+"""Conditional GET support: ETag/Last-Modified validators derived from table versions."""
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from models import table_versions
+
+class DataVersionValidator:
+    """Validators for a response computed only from `tables` (and `variant`, e.g. the query string).
+
+    The ETag changes whenever a write to one of the tables is committed in this
+    process, so it can be checked before doing any database work.
+    """
+
+    def __init__(self, tables: Iterable[str], variant: str = ""):
+        tables = sorted(tables)
+        versions = ",".join(f"{table}={table_versions.get(table)}" for table in tables)
+        digest = hashlib.sha1(f"{table_versions.boot_id}|{versions}|{variant}".encode()).hexdigest()
+        self.etag = f'W/"{digest[:24]}"'
+        self.modified_at = max(table_versions.modified_at(table) for table in tables).replace(tzinfo=timezone.utc)
+        # HTTP dates have whole seconds; rounding down would date the response before its last write
+        self.last_modified = self.modified_at.replace(microsecond=0)
+        if self.modified_at.microsecond:
+            self.last_modified += timedelta(seconds=1)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        headers = {
+            "ETag": self.etag,
+            # Let clients keep the payload but revalidate on every poll
+            "Cache-Control": "no-cache",
+        }
+        # Until that second is over another write could still land in it unnoticed by
+        # If-Modified-Since, so only the ETag validates such responses
+        if datetime.now(timezone.utc) >= self.last_modified:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+        return headers
+
+    def matches(self, request: Request) -> bool:
+        """True if the client's cached copy is current (If-None-Match, else If-Modified-Since)."""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or _opaque(self.etag) in {_opaque(tag) for tag in tags}
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is not None:
+            try:
+                return self.modified_at <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def not_modified(self) -> Response:
+        return Response(status_code=304, headers=self.headers)
+
+def _opaque(tag: str) -> str:
+    """Strip the weak prefix: If-None-Match uses weak comparison."""
+    return tag[2:] if tag.startswith("W/") else tag
+
+class ResponseCache:
+    """Small LRU of rendered JSON bodies keyed by ETag."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._bodies: OrderedDict = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+            return body
+
+    def put(self, key: str, body: bytes):
+        with self._lock:
+            self._bodies[key] = body
+            self._bodies.move_to_end(key)
+            while len(self._bodies) > self.max_entries:
+                self._bodies.popitem(last=False)
+
+response_cache = ResponseCache()
+
+def cached_json(
+    request: Request,
+    tables: Iterable[str],
+    build: Callable[[], Any],
+    variant: str = "",
+    cache: ResponseCache = response_cache
+) -> Response:
+    """Serve `build()` as JSON with validators, answering 304 or a cached body when data is unchanged."""
+    validator = DataVersionValidator(tables, variant)
+    if validator.matches(request):
+        return validator.not_modified()
+    body = cache.get(validator.etag)
+    if body is None:
+        body = JSONResponse(content=jsonable_encoder(build())).body
+        cache.put(validator.etag, body)
+    return Response(content=body, media_type="application/json", headers=validator.headers)
@@ -0,0 +1,178 @@
+"""Background processing of CSV uploads, with progress persisted in the database."""
+import logging
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Optional
+
+from models import SessionLocal, UploadJob
+from services import TransactionIngestService
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+class UploadJobManager:
+    """Runs upload jobs on a thread pool so request handlers return immediately."""
+
+    def __init__(self, max_workers: int = 2, chunk_rows: int = 50000, insert_chunk_size: int = 5000):
+        self.chunk_rows = chunk_rows
+        self.insert_chunk_size = insert_chunk_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="upload-job")
+
+    def submit(self, source_path: str, filename: str, sha256: Optional[str] = None) -> str:
+        """Record a queued job for the spooled file at `source_path` and schedule it."""
+        job_id = uuid.uuid4().hex
+        db = SessionLocal()
+        try:
+            db.add(UploadJob(
+                id=job_id,
+                filename=filename,
+                source_path=source_path,
+                sha256=sha256,
+                status=QUEUED,
+                bytes_total=os.path.getsize(source_path)
+            ))
+            db.commit()
+        finally:
+            db.close()
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return the job's status with throughput and ETA, or None if unknown."""
+        db = SessionLocal()
+        try:
+            job = db.query(UploadJob).filter(UploadJob.id == job_id).first()
+            return self._describe(job) if job else None
+        finally:
+            db.close()
+
+    def recover(self):
+        """Reconcile jobs left over from a previous process after a restart.
+
+        Queued jobs whose spooled file survived are scheduled again. Jobs that
+        were running have committed part of their rows, so they are marked failed
+        rather than replayed.
+        """
+        db = SessionLocal()
+        try:
+            pending = db.query(UploadJob).filter(UploadJob.status.in_([QUEUED, RUNNING])).all()
+            requeue = []
+            for job in pending:
+                if job.status == QUEUED and job.source_path and os.path.exists(job.source_path):
+                    requeue.append(job.id)
+                    continue
+                job.status = FAILED
+                job.error = "Interrupted by a server restart"
+                job.finished_at = datetime.utcnow()
+                self._remove_source(job.source_path)
+            db.commit()
+        finally:
+            db.close()
+        for job_id in requeue:
+            self._executor.submit(self._run, job_id)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job_id: str):
+        status_db = SessionLocal()
+        ingest_db = SessionLocal()
+        job = None
+        try:
+            job = status_db.query(UploadJob).filter(UploadJob.id == job_id).one()
+            job.status = RUNNING
+            job.started_at = datetime.utcnow()
+            status_db.commit()
+
+            def update_progress(progress: Dict):
+                job.rows_processed = progress["rows_processed"]
+                job.rows_accepted = progress["rows_accepted"]
+                job.rows_rejected = progress["rows_rejected"]
+                job.rows_duplicate = progress["rows_duplicate"]
+                if progress["bytes_read"] is not None:
+                    job.bytes_read = min(progress["bytes_read"], job.bytes_total)
+                status_db.commit()
+
+            ingest_service = TransactionIngestService(ingest_db, chunk_size=self.insert_chunk_size)
+            with open(job.source_path, "rb") as source:
+                ingest_service.ingest_csv(source, chunk_rows=self.chunk_rows, progress=update_progress)
+
+            if job.sha256:
+                ingest_service.record_file(job.sha256, job.filename, job.bytes_total, job.rows_accepted)
+            job.status = COMPLETED
+            job.bytes_read = job.bytes_total
+        except Exception as e:
+            logger.exception("Upload job %s failed", job_id)
+            ingest_db.rollback()
+            if job is None:
+                # The lookup itself failed; still try to take the job out of the queue
+                status_db.rollback()
+                self._mark_failed(status_db, job_id, str(e))
+            else:
+                job.status = FAILED
+                job.error = str(e)
+        finally:
+            try:
+                if job is not None:
+                    job.finished_at = datetime.utcnow()
+                    status_db.commit()
+                    self._remove_source(job.source_path)
+            finally:
+                status_db.close()
+                ingest_db.close()
+
+    @staticmethod
+    def _mark_failed(db, job_id: str, error: str):
+        try:
+            db.query(UploadJob).filter(UploadJob.id == job_id).update(
+                {UploadJob.status: FAILED, UploadJob.error: error, UploadJob.finished_at: datetime.utcnow()},
+                synchronize_session=False
+            )
+            db.commit()
+        except Exception:
+            logger.exception("Could not mark upload job %s as failed", job_id)
+            db.rollback()
+
+    @staticmethod
+    def _remove_source(path: Optional[str]):
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    @staticmethod
+    def _describe(job: UploadJob) -> Dict:
+        end = job.finished_at or datetime.utcnow()
+        elapsed = (end - job.started_at).total_seconds() if job.started_at else 0.0
+        rows_per_second = job.rows_processed / elapsed if elapsed > 0 else 0.0
+        eta_seconds = None
+        if job.status == RUNNING and job.bytes_read and job.bytes_total:
+            eta_seconds = round(elapsed * (job.bytes_total - job.bytes_read) / job.bytes_read, 1)
+        elif job.status == COMPLETED:
+            eta_seconds = 0.0
+
+        description = {
+            "job_id": job.id,
+            "filename": job.filename,
+            "status": job.status,
+            "rows_processed": job.rows_processed,
+            "rows_accepted": job.rows_accepted,
+            "rows_rejected": job.rows_rejected,
+            "rows_duplicate": job.rows_duplicate,
+            "bytes_read": job.bytes_read,
+            "bytes_total": job.bytes_total,
+            "rows_per_second": round(rows_per_second, 1),
+            "elapsed_seconds": round(elapsed, 1),
+            "eta_seconds": eta_seconds,
+            "error": job.error,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        }
+        if job.status == COMPLETED:
+            description["message"] = f"Successfully uploaded {job.rows_accepted} transactions"
+        return description
@@ -0,0 +1,93 @@
+"""Concurrent-client load test for a running API server.
+
+Fires requests from N concurrent clients at the read-heavy endpoints and
+reports throughput and latency percentiles per route as JSON, e.g.:
+
+    python loadtest.py --base-url http://localhost:8000 --clients 50 --requests 40
+"""
+import argparse
+import json
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# (method, path, JSON body) cycled through by every client
+DEFAULT_SCENARIO = [
+    ("GET", "/api/dashboard/summary", None),
+    ("GET", "/api/transactions?limit=100", None),
+    ("GET", "/api/categories", None),
+    ("POST", "/api/copilot/query", {"question": "How much did I spend on groceries?"}),
+]
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def _request(base_url: str, method: str, path: str, body: Optional[dict], timeout: float) -> Tuple[float, bool]:
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(
+        base_url + path, data=data, method=method, headers={"Content-Type": "application/json"}
+    )
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            ok = 200 <= response.status < 400
+    except Exception:
+        ok = False
+    return (time.perf_counter() - start) * 1000, ok
+
+def run(base_url: str, clients: int, requests_per_client: int, timeout: float = 30.0) -> Dict:
+    """Run the scenario from `clients` threads and summarize latency per route (ms)."""
+    def client(client_index: int) -> List[Tuple[str, float, bool]]:
+        results = []
+        for i in range(requests_per_client):
+            method, path, body = DEFAULT_SCENARIO[(client_index + i) % len(DEFAULT_SCENARIO)]
+            elapsed, ok = _request(base_url, method, path, body, timeout)
+            results.append((f"{method} {path.split('?')[0]}", elapsed, ok))
+        return results
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        samples = [sample for batch in pool.map(client, range(clients)) for sample in batch]
+    wall = time.perf_counter() - start
+
+    by_route: Dict[str, List[Tuple[float, bool]]] = {}
+    for route, elapsed, ok in samples:
+        by_route.setdefault(route, []).append((elapsed, ok))
+
+    def summarize(entries: List[Tuple[float, bool]]) -> Dict:
+        latencies = [elapsed for elapsed, _ in entries]
+        return {
+            "requests": len(entries),
+            "errors": sum(1 for _, ok in entries if not ok),
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+            "max_ms": round(max(latencies), 1),
+        }
+
+    return {
+        "clients": clients,
+        "requests": len(samples),
+        "wall_seconds": round(wall, 2),
+        "requests_per_second": round(len(samples) / wall, 1),
+        "overall": summarize([(elapsed, ok) for _, elapsed, ok in samples]),
+        "routes": {route: summarize(entries) for route, entries in sorted(by_route.items())},
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=40, help="requests per client")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+    print(json.dumps(run(args.base_url.rstrip("/"), args.clients, args.requests, args.timeout), indent=2))
+
+if __name__ == "__main__":
+    main()
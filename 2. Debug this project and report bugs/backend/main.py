@@ -1,25 +1,74 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
-from typing import List, Dict, Any
-import pandas as pd
-import io
-from datetime import datetime, timedelta
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime
+import anyio
+import hashlib
+import logging
 import os
+import tempfile
 
-from models import get_db, create_tables, Transaction, Category
+from models import get_db, create_tables, engine, SessionLocal, Transaction, Category, MonthlyCategoryRollup
 from schemas import (
     Transaction as TransactionSchema,
-    TransactionCreate,
     TransactionUpdate,
+    BulkTransactionUpdate,
+    BulkTransactionUpdateResult,
     Category as CategorySchema,
     CategoryCreate,
-    ExpenseSummary,
     CopilotQuery,
-    CopilotResponse
+    CopilotResponse,
+    CopilotBatchQuery,
+    CopilotBatchResponse
+)
+from http_cache import DataVersionValidator, cached_json
+from jobs import UploadJobManager
+import metrics
+from services import (
+    BulkCategoryUpdateService,
+    CSVFormatError,
+    CategorizationService,
+    CopilotService,
+    PageCursor,
+    RecategorizationService,
+    RollupService,
+    TransactionExportService,
+    TransactionIngestService,
+    begin_write,
+    copilot_cache,
+    filter_transactions,
+    paginate_transactions,
+    search_transactions
+)
+
+# Rows per executemany batch when bulk-inserting uploaded transactions
+UPLOAD_INSERT_CHUNK_SIZE = int(os.getenv("UPLOAD_INSERT_CHUNK_SIZE", 5000))
+# Rows parsed and committed per chunk when streaming an upload
+UPLOAD_STREAM_CHUNK_ROWS = int(os.getenv("UPLOAD_STREAM_CHUNK_ROWS", 50000))
+
+# Background upload workers and where uploads are spooled while they wait
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", 2))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "finance-uploads"))
+
+# Worker threads available to the synchronous (database-bound) endpoints
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", 40))
+# Opt-in per-route latency/SQL metrics served on GET /metrics
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "False").lower() == "true"
+# With metrics on, profile endpoints and keep snapshots of calls slower than this (0 disables)
+PROFILE_THRESHOLD_MS = float(os.getenv("PROFILE_THRESHOLD_MS", 0))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "finance-profiles"))
+PROFILER = os.getenv("PROFILER", "cprofile")
+
+logger = logging.getLogger(__name__)
+
+upload_jobs = UploadJobManager(
+    max_workers=UPLOAD_WORKERS,
+    chunk_rows=UPLOAD_STREAM_CHUNK_ROWS,
+    insert_chunk_size=UPLOAD_INSERT_CHUNK_SIZE
 )
-from services import CategorizationService, CopilotService
 
 app = FastAPI(
     title="Personal Finance Copilot API",
@@ -44,18 +93,33 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Prev-Cursor", "ETag", "Last-Modified"],
 )
 
+# Database-bound endpoints are plain `def` functions: FastAPI runs them on a worker
+# thread pool (THREADPOOL_SIZE) so blocking SQLAlchemy calls never stall the event
+# loop. Keep endpoints that touch the session synchronous.
+
 # Create tables on startup
 @app.on_event("startup")
 async def startup_event():
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    
     create_tables()
     
     # Create default categories if they don't exist
-    db = next(get_db())
+    db = SessionLocal()
     categorization_service = CategorizationService(db)
     categorization_service.create_default_categories()
+    RollupService(db).ensure_built()
+    TransactionIngestService(db).backfill_fingerprints()
     db.close()
+    
+    upload_jobs.recover()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    upload_jobs.shutdown()
 
 @app.get("/")
 async def root():
@@ -73,99 +137,287 @@ async def health_check():
 
 # Transaction endpoints
 @app.post("/api/transactions/upload")
-async def upload_csv(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    """Upload and parse CSV file with transactions."""
+def upload_csv(
+    response: Response,
+    file: UploadFile = File(...),
+    background: bool = True,
+    stream: bool = False,
+    chunk_rows: int = Query(UPLOAD_STREAM_CHUNK_ROWS, ge=1),
+    db: Session = Depends(get_db)
+):
+    """Upload and parse CSV file with transactions.
+    
+    By default the file is queued as a background job and a job id is returned
+    immediately; poll GET /api/jobs/{job_id} for progress. With `background=false`
+    the upload is processed inline, and `stream=true` then parses and commits it
+    `chunk_rows` rows at a time to keep memory bounded. A file identical to one
+    already ingested is refused with 409, and rows already stored are skipped.
+    """
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="File must be a CSV")
     
-    contents = await file.read()
-    df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
-    
-    # Validate required columns
-    required_columns = ['date', 'description', 'amount']
-    missing_columns = [col for col in required_columns if col not in df.columns]
-    if missing_columns:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Missing required columns: {missing_columns}"
-        )
+    # Identical files are refused by content hash before any parsing
+    ingest_service = TransactionIngestService(db, chunk_size=UPLOAD_INSERT_CHUNK_SIZE)
+    if background:
+        source_path, sha256 = _spool_upload(file)
+        file.file.seek(0)
+    else:
+        source_path, sha256 = None, TransactionIngestService.file_sha256(file.file)
+    try:
+        if ingest_service.is_known_file(sha256):
+            raise HTTPException(status_code=409, detail="This file has already been uploaded")
+        try:
+            TransactionIngestService.validate_header(file.file)
+        except CSVFormatError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if background:
+            job_id = upload_jobs.submit(source_path, file.filename, sha256=sha256)
+            # The job owns the spooled file from here on
+            source_path = None
+    finally:
+        if source_path:
+            os.remove(source_path)
     
-    categorization_service = CategorizationService(db)
-    transactions_created = []
+    if background:
+        response.status_code = 202
+        return {
+            "message": "Upload queued for processing",
+            "job_id": job_id,
+            "status_url": f"/api/jobs/{job_id}"
+        }
     
-    for _, row in df.iterrows():
-        try:
-            # Parse date
-            date = pd.to_datetime(row['date']).to_pydatetime()
-            
-            # Auto-categorize
-            category_id = categorization_service.auto_categorize_transaction(row['description'])
-            if category_id is None:
-                category_id = 9
-            
-            # Create transaction
-            transaction = Transaction(
-                date=date,
-                description=str(row['description']),
-                amount=float(row['amount']),
-                category_id=category_id
-            )
-            
-            db.add(transaction)
-            transactions_created.append(transaction)
-            
-        except Exception as e:
-            continue  # Skip invalid rows
+    def log_progress(progress: Dict[str, Any]):
+        logger.info(
+            "Upload %s: %d rows processed (%d rejected), %s bytes read",
+            file.filename, progress["rows_processed"], progress["rows_rejected"], progress["bytes_read"]
+        )
     
-    db.commit()
+    try:
+        result = ingest_service.ingest_csv(
+            file.file,
+            chunk_rows=chunk_rows if stream else None,
+            progress=log_progress if stream else None
+        )
+    except CSVFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    ingest_service.record_file(sha256, file.filename, file.size, result["accepted"])
     
     return {
-        "message": f"Successfully uploaded {len(transactions_created)} transactions",
-        "count": len(transactions_created)
+        "message": f"Successfully uploaded {result['accepted']} transactions",
+        "count": result["accepted"],
+        **result
     }
 
+def _spool_upload(file: UploadFile) -> Tuple[str, str]:
+    """Copy an upload to UPLOAD_SPOOL_DIR so a job can read it after the request ends.
+    
+    Returns the spooled path and the file's SHA-256, computed during the copy.
+    """
+    os.makedirs(UPLOAD_SPOOL_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=".csv", dir=UPLOAD_SPOOL_DIR)
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as spooled:
+            for block in iter(lambda: file.file.read(1024 * 1024), b""):
+                digest.update(block)
+                spooled.write(block)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, digest.hexdigest()
+
+def _canonical_query(request: Request) -> str:
+    """The query string with parameters sorted, so equivalent URLs share an ETag."""
+    return "&".join(f"{key}={value}" for key, value in sorted(request.query_params.multi_items()))
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    """Report an upload job's progress: rows processed/rejected, throughput and ETA."""
+    job = upload_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @app.get("/api/transactions", response_model=List[TransactionSchema])
-async def get_transactions(
+def get_transactions(
+    request: Request,
+    response: Response,
     skip: int = 0, 
-    limit: int = 100,
+    limit: int = Query(100, ge=1),
     category_id: int = None,
+    cursor: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    description_prefix: Optional[str] = Query(None, min_length=1),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
     db: Session = Depends(get_db)
 ):
-    """Get all transactions with optional filtering."""
-    query = db.query(Transaction)
+    """Get transactions ordered by (date, id) with keyset pagination and optional filtering.
+    
+    Pass the X-Next-Cursor / X-Prev-Cursor response header back as `cursor` to move
+    between pages; `skip` is kept for offset-based clients. Answers 304 when the
+    client's ETag shows nothing changed since it fetched this page.
+    """
+    validator = DataVersionValidator(
+        [Transaction.__tablename__, Category.__tablename__], variant=_canonical_query(request)
+    )
+    if validator.matches(request):
+        return validator.not_modified()
+    response.headers.update(validator.headers)
+    
+    try:
+        page_cursor = PageCursor.decode(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    if category_id:
-        query = query.filter(Transaction.category_id == category_id)
+    query = filter_transactions(
+        db.query(Transaction),
+        category_id=category_id,
+        start_date=start_date,
+        end_date=end_date,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        description_prefix=description_prefix
+    )
+    transactions, next_cursor, prev_cursor = paginate_transactions(
+        query, limit, cursor=page_cursor, descending=order == "desc", skip=skip,
+        row_query=db.query(Transaction).options(joinedload(Transaction.category_obj))
+    )
     
-    transactions = query.offset(skip).limit(limit).all()
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor.encode()
+    if prev_cursor:
+        response.headers["X-Prev-Cursor"] = prev_cursor.encode()
     return transactions
 
+@app.get("/api/transactions/export")
+def export_transactions(
+    format: str = Query("parquet", pattern="^(parquet|arrow)$"),
+    category_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    batch_size: int = Query(50000, ge=1)
+):
+    """Stream matching transactions with category names as Parquet or Arrow IPC (stream format)."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Export requires pyarrow to be installed")
+    media_type, extension = TransactionExportService.FORMATS[format]
+    
+    def body():
+        # The response is produced after this handler returns, so it owns its session
+        db = SessionLocal()
+        try:
+            export_service = TransactionExportService(db, batch_size=batch_size)
+            query = export_service.query(category_id=category_id, start_date=start_date, end_date=end_date)
+            yield from export_service.stream(format, query)
+        finally:
+            db.close()
+    
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="transactions.{extension}"'}
+    )
+
+@app.get("/api/transactions/search", response_model=List[TransactionSchema])
+def search_transaction_descriptions(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(100, ge=1),
+    skip: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    """Full-text search over descriptions, ranked by relevance; words match as prefixes."""
+    query = db.query(Transaction).options(joinedload(Transaction.category_obj))
+    return search_transactions(query, q, limit=limit, skip=skip)
+
+@app.post("/api/transactions/recategorize")
+def recategorize_transactions(
+    scope: str = Query("all", pattern="^(all|uncategorized)$"),
+    dry_run: bool = False,
+    batch_size: int = Query(5000, ge=1),
+    db: Session = Depends(get_db)
+):
+    """Re-run keyword categorization over stored transactions after categories change.
+    
+    `scope=uncategorized` limits the run to transactions without a category or in
+    "Other". With `dry_run=true` nothing is written and the report shows what would move.
+    """
+    return RecategorizationService(db, batch_size=batch_size).recategorize(scope=scope, dry_run=dry_run)
+
 @app.put("/api/transactions/{transaction_id}", response_model=TransactionSchema)
-async def update_transaction(
+def update_transaction(
     transaction_id: int,
     transaction_update: TransactionUpdate,
     db: Session = Depends(get_db)
 ):
     """Update a transaction (mainly for changing category)."""
+    # Read the current category under the write lock so the rollup moves the row out of the right bucket
+    begin_write(db)
     transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
-    if transaction_update.category_id is not None:
+    if transaction_update.category_id is not None and transaction_update.category_id != transaction.category_id:
+        old_category_id = transaction.category_id
         transaction.category_id = transaction_update.category_id
+        db.flush()
+        RollupService(db).move(transaction, old_category_id)
     
     db.commit()
-    db.refresh(transaction)
-    return transaction
+    # Reload with the category joined in so serializing category_obj needs no extra SELECT
+    return db.query(Transaction).options(joinedload(Transaction.category_obj))\
+        .filter(Transaction.id == transaction_id).one()
+
+@app.patch("/api/transactions", response_model=BulkTransactionUpdateResult)
+def update_transactions(bulk_update: BulkTransactionUpdate, db: Session = Depends(get_db)):
+    """Recategorize many transactions in one transaction and return the ids that changed.
+    
+    Send either `changes`, a list of {id, category_id}, or a `filter` (the list
+    endpoint's filters) together with the target `category_id`.
+    """
+    if (bulk_update.changes is None) == (bulk_update.filter is None):
+        raise HTTPException(status_code=400, detail="Provide either changes or filter")
+    
+    update_service = BulkCategoryUpdateService(db)
+    if bulk_update.changes is not None:
+        changes = {change.id: change.category_id for change in bulk_update.changes}
+        category_ids = set(changes.values())
+    else:
+        # Every field left after dropping unset ones is a real condition (falsy values such
+        # as category_id=0 included; an empty description_prefix is rejected by the schema)
+        filters = bulk_update.filter.dict(exclude_none=True)
+        if not filters:
+            raise HTTPException(status_code=400, detail="Filter must restrict at least one field")
+        if bulk_update.category_id is None:
+            raise HTTPException(status_code=400, detail="category_id is required with a filter")
+        category_ids = {bulk_update.category_id}
+    
+    unknown = update_service.unknown_categories(category_ids)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown category ids: {unknown}")
+    
+    if bulk_update.changes is not None:
+        updated_ids = update_service.apply_changes(changes)
+    else:
+        updated_ids = update_service.apply_filter(filters, bulk_update.category_id)
+    return BulkTransactionUpdateResult(updated_ids=updated_ids)
 
 # Category endpoints
 @app.get("/api/categories", response_model=List[CategorySchema])
-async def get_categories(db: Session = Depends(get_db)):
+def get_categories(request: Request, db: Session = Depends(get_db)):
     """Get all categories."""
-    return db.query(Category).all()
+    return cached_json(
+        request,
+        [Category.__tablename__],
+        lambda: [CategorySchema.model_validate(category) for category in db.query(Category).all()]
+    )
 
 @app.post("/api/categories", response_model=CategorySchema)
-async def create_category(category: CategoryCreate, db: Session = Depends(get_db)):
+def create_category(category: CategoryCreate, db: Session = Depends(get_db)):
     """Create a new category."""
     db_category = Category(**category.dict())
     db.add(db_category)
@@ -175,20 +427,32 @@ async def create_category(category: CategoryCreate, db: Session = Depends(get_db
 
 # Dashboard endpoints
 @app.get("/api/dashboard/summary")
-async def get_dashboard_summary(db: Session = Depends(get_db)):
-    """Get dashboard summary data."""
-    # Total expenses
-    total_expenses = db.query(func.sum(func.abs(Transaction.amount))).scalar() or 0
+def get_dashboard_summary(request: Request, db: Session = Depends(get_db)):
+    """Get dashboard summary data, served from the monthly/category rollup.
     
-    # Total transactions
-    total_transactions = db.query(Transaction).count()
+    Polls between writes are answered with 304 or a cached body, without touching the database.
+    """
+    return cached_json(
+        request,
+        [MonthlyCategoryRollup.__tablename__, Category.__tablename__],
+        lambda: _dashboard_summary(db)
+    )
+
+def _dashboard_summary(db: Session) -> Dict[str, Any]:
+    # Total expenses and transactions
+    total_expenses, total_transactions = db.query(
+        func.sum(MonthlyCategoryRollup.total_amount),
+        func.sum(MonthlyCategoryRollup.transaction_count)
+    ).one()
+    total_expenses = total_expenses or 0
+    total_transactions = total_transactions or 0
     
     # Expenses by category
     expenses_by_category = db.query(
         Category.name,
-        func.sum(func.abs(Transaction.amount)).label('total'),
-        func.count(Transaction.id).label('count')
-    ).join(Transaction, Category.id == Transaction.category_id, isouter=True)\
+        func.sum(MonthlyCategoryRollup.total_amount).label('total'),
+        func.sum(MonthlyCategoryRollup.transaction_count).label('count')
+    ).join(MonthlyCategoryRollup, Category.id == MonthlyCategoryRollup.category_id, isouter=True)\
      .group_by(Category.name).all()
     
     category_data = [
@@ -200,14 +464,13 @@ async def get_dashboard_summary(db: Session = Depends(get_db)):
         for row in expenses_by_category
     ]
     
-    # Monthly expenses (last 12 months)
-    twelve_months_ago = datetime.now() - timedelta(days=365)
+    # Monthly expenses
     monthly_expenses = db.query(
-        extract('year', Transaction.date).label('year'),
-        extract('month', Transaction.date).label('month'),
-        func.sum(func.abs(Transaction.amount)).label('total')
-    ).group_by(extract('year', Transaction.date), extract('month', Transaction.date))\
-     .order_by(extract('year', Transaction.date), extract('month', Transaction.date)).all()
+        MonthlyCategoryRollup.year,
+        MonthlyCategoryRollup.month,
+        func.sum(MonthlyCategoryRollup.total_amount).label('total')
+    ).group_by(MonthlyCategoryRollup.year, MonthlyCategoryRollup.month)\
+     .order_by(MonthlyCategoryRollup.year, MonthlyCategoryRollup.month).all()
     
     monthly_data = [
         {
@@ -227,12 +490,32 @@ async def get_dashboard_summary(db: Session = Depends(get_db)):
 
 # Copilot endpoint
 @app.post("/api/copilot/query", response_model=CopilotResponse)
-async def query_copilot(query: CopilotQuery, db: Session = Depends(get_db)):
+def query_copilot(query: CopilotQuery, db: Session = Depends(get_db)):
     """Process natural language queries about expenses."""
     copilot_service = CopilotService(db)
     result = copilot_service.process_query(query.question)
     return CopilotResponse(**result)
 
+@app.post("/api/copilot/batch", response_model=CopilotBatchResponse)
+def query_copilot_batch(query: CopilotBatchQuery, db: Session = Depends(get_db)):
+    """Answer several questions with shared queries; answers are returned in input order."""
+    answers = CopilotService(db).process_batch(query.questions)
+    return CopilotBatchResponse(answers=[CopilotResponse(**answer) for answer in answers])
+
+@app.get("/api/copilot/cache")
+async def copilot_cache_stats():
+    """Hit/miss counters and sizes of the copilot plan and answer caches."""
+    return copilot_cache.stats()
+
+# Instrumentation wraps the routes above, so it is installed after they are all registered
+if METRICS_ENABLED:
+    metrics.install(
+        app,
+        engine,
+        profiler=metrics.SlowRequestProfiler(PROFILE_THRESHOLD_MS, PROFILE_DIR, backend=PROFILER)
+        if PROFILE_THRESHOLD_MS > 0 else None
+    )
+
 if __name__ == "__main__":
     import uvicorn
     
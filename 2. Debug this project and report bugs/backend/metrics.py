@@ -0,0 +1,303 @@
+"""Opt-in request metrics: latency histograms, SQL counters and slow-request profiles.
+
+Nothing here is active unless `install()` is called (main.py does so when
+METRICS_ENABLED is set); an app without it has no extra middleware, engine
+listeners or wrapped endpoints.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Response
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+class RequestStats:
+    """SQL work attributed to one request; shared with the worker thread running its endpoint."""
+    __slots__ = ("statements", "sql_seconds", "rows_written", "endpoint_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.rows_written = 0
+        self.endpoint_seconds = 0.0
+
+_current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "current_request_stats", default=None
+)
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Thread-safe store of the collected series, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_duration: Dict[Tuple[str, str, str], Histogram] = {}
+        self.endpoint_duration: Dict[Tuple[str, str], Histogram] = {}
+        self.statements_per_request: Dict[Tuple[str, str], Histogram] = {}
+        self.sql_statements: Dict[str, int] = {}
+        self.sql_seconds: Dict[str, float] = {}
+        self.sql_rows_written: Dict[str, int] = {}
+        self.profiles_captured: Dict[str, int] = {}
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        with self._lock:
+            self.request_duration.setdefault((method, route, str(status)), Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.endpoint_duration.setdefault((method, route), Histogram(LATENCY_BUCKETS))\
+                .observe(stats.endpoint_seconds)
+            self.statements_per_request.setdefault((method, route), Histogram(STATEMENT_BUCKETS))\
+                .observe(stats.statements)
+        self.observe_sql(route, stats.statements, stats.sql_seconds, stats.rows_written)
+
+    def observe_sql(self, route: str, statements: int, seconds: float, rows_written: int):
+        with self._lock:
+            self.sql_statements[route] = self.sql_statements.get(route, 0) + statements
+            self.sql_seconds[route] = self.sql_seconds.get(route, 0.0) + seconds
+            self.sql_rows_written[route] = self.sql_rows_written.get(route, 0) + rows_written
+
+    def count_profile(self, route: str):
+        with self._lock:
+            self.profiles_captured[route] = self.profiles_captured.get(route, 0) + 1
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            _render_histograms(
+                lines, "http_request_duration_seconds", "Request latency including serialization.",
+                ("method", "route", "status"), self.request_duration
+            )
+            _render_histograms(
+                lines, "http_endpoint_duration_seconds", "Time spent inside the endpoint function.",
+                ("method", "route"), self.endpoint_duration
+            )
+            _render_histograms(
+                lines, "http_request_sql_statements", "SQL statements executed per request.",
+                ("method", "route"), self.statements_per_request
+            )
+            _render_counters(lines, "sql_statements_total", "SQL statements executed.", self.sql_statements)
+            _render_counters(lines, "sql_duration_seconds_total", "Time spent executing SQL.", self.sql_seconds)
+            _render_counters(
+                lines, "sql_rows_written_total", "Rows inserted, updated or deleted, including by triggers.", self.sql_rows_written
+            )
+            _render_counters(
+                lines, "profiles_captured_total", "Slow-request profiles written.", self.profiles_captured
+            )
+        return "\n".join(lines) + "\n"
+
+def _label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    return "{" + ",".join(f'{name}="{_label_value(value)}"' for name, value in zip(names, values)) + "}"
+
+def _render_histograms(lines: List[str], name: str, help_text: str, label_names: Tuple[str, ...],
+                       series: Dict[Tuple[str, ...], Histogram]):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for label_values, histogram in sorted(series.items()):
+        bucket_names = label_names + ("le",)
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            lines.append(f"{name}_bucket{_labels(bucket_names, label_values + (str(bound),))} {count}")
+        lines.append(f"{name}_bucket{_labels(bucket_names, label_values + ('+Inf',))} {histogram.count}")
+        lines.append(f"{name}_sum{_labels(label_names, label_values)} {histogram.sum}")
+        lines.append(f"{name}_count{_labels(label_names, label_values)} {histogram.count}")
+
+def _render_counters(lines: List[str], name: str, help_text: str, series: Dict[str, float]):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for route, value in sorted(series.items()):
+        lines.append(f"{name}{_labels(('route',), (route,))} {value}")
+
+class SlowRequestProfiler:
+    """Profiles endpoint calls and keeps snapshots of those slower than `threshold_ms`.
+
+    Profiling runs inside the worker thread that executes a sync endpoint (async ones
+    share the event loop thread, where concurrent profilers would collide, and are
+    only timed). Every request pays the profiler's overhead while this is on; enable
+    it only while investigating.
+    """
+
+    def __init__(self, threshold_ms: float, directory: str, backend: str = "cprofile", keep: int = 50):
+        if backend not in ("cprofile", "pyinstrument"):
+            raise ValueError(f"Unknown profiler: {backend}")
+        if backend == "pyinstrument":
+            import pyinstrument  # noqa: F401  (fail at startup rather than on the first slow request)
+        self.threshold = threshold_ms / 1000
+        self.directory = directory
+        self.backend = backend
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        if self.backend == "pyinstrument":
+            from pyinstrument import Profiler
+            profiler = Profiler(async_mode="disabled")
+            profiler.start()
+        else:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+
+    def finish(self, profiler, route: str, seconds: float) -> bool:
+        """Stop `profiler` and write its snapshot if the call was slow; returns whether it was kept."""
+        if self.backend == "pyinstrument":
+            profiler.stop()
+        else:
+            profiler.disable()
+        if seconds < self.threshold:
+            return False
+        slug = re.sub(r"[^A-Za-z0-9]+", "-", route).strip("-") or "root"
+        stem = os.path.join(self.directory, f"{time.strftime('%Y%m%dT%H%M%S')}-{slug}-{int(seconds * 1000)}ms")
+        if self.backend == "pyinstrument":
+            with open(stem + ".html", "w") as f:
+                f.write(profiler.output_html())
+        else:
+            profiler.dump_stats(stem + ".prof")
+        self._prune()
+        return True
+
+    def _prune(self):
+        snapshots = sorted(
+            (os.path.join(self.directory, name) for name in os.listdir(self.directory)
+             if name.endswith((".prof", ".html"))),
+            key=os.path.getmtime
+        )
+        for path in snapshots[:-self.keep]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing each HTTP request and attributing its SQL work to the route."""
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_request.reset(token)
+            route = scope.get("route")
+            # The route template keeps label cardinality bounded; unmatched paths share one label
+            template = route.path_format if route is not None else "unmatched"
+            self.registry.observe_request(scope["method"], template, status[0], elapsed, stats)
+
+def _instrument_endpoint(route: APIRoute, registry: MetricsRegistry, profiler: Optional[SlowRequestProfiler]):
+    """Wrap the endpoint function to time it, and profile it in its worker thread if it is sync."""
+    call = route.dependant.call
+    template = route.path_format
+
+    def finish(stats: Optional[RequestStats], snapshot, elapsed: float):
+        if stats is not None:
+            stats.endpoint_seconds += elapsed
+        if snapshot is not None and profiler.finish(snapshot, template, elapsed):
+            registry.count_profile(template)
+
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                finish(_current_request.get(), None, time.perf_counter() - start)
+    else:
+        @functools.wraps(call)
+        def wrapper(*args, **kwargs):
+            snapshot = profiler.start() if profiler else None
+            start = time.perf_counter()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                finish(_current_request.get(), snapshot, time.perf_counter() - start)
+    route.dependant.call = wrapper
+
+def _record_sql(registry: MetricsRegistry, statements: int, seconds: float, rows: int):
+    stats = _current_request.get()
+    if stats is None:
+        registry.observe_sql("background", statements, seconds, rows)
+    else:
+        stats.statements += statements
+        stats.sql_seconds += seconds
+        stats.rows_written += rows
+
+def _listen_to_engine(engine: Engine, registry: MetricsRegistry):
+    # SQLite can't report rows examined. Rows written are taken from the connection's
+    # total_changes between checkout and checkin, which (unlike cursor.rowcount) also
+    # covers INSERT ... RETURNING and trigger writes; other drivers fall back to rowcount.
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["metrics_changes"] = getattr(dbapi_connection, "total_changes", None)
+
+    @event.listens_for(engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        changes = connection_record.info.pop("metrics_changes", None)
+        if changes is not None and dbapi_connection is not None:
+            _record_sql(registry, 0, 0.0, dbapi_connection.total_changes - changes)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+        tracks_changes = hasattr(conn.connection.dbapi_connection, "total_changes")
+        _record_sql(registry, 1, elapsed, 0 if tracks_changes else max(cursor.rowcount, 0))
+
+def install(app: FastAPI, engine: Engine, profiler: Optional[SlowRequestProfiler] = None) -> MetricsRegistry:
+    """Instrument `app` and `engine` and add GET /metrics; call after every route is registered."""
+    registry = MetricsRegistry()
+    for route in app.routes:
+        if isinstance(route, APIRoute):
+            _instrument_endpoint(route, registry, profiler)
+    _listen_to_engine(engine, registry)
+    app.add_middleware(MetricsMiddleware, registry=registry)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    return registry
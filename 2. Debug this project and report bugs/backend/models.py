@@ -1,7 +1,12 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import create_engine, event, inspect, Column, Integer, String, Float, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
+from itertools import chain
+import os
+import threading
+import uuid
 
 Base = declarative_base()
 
@@ -22,18 +27,234 @@ class Transaction(Base):
     description = Column(String, index=True)
     amount = Column(Float)
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
+    # Hash of (date, normalized description, amount, occurrence ordinal); makes re-uploads no-ops
+    fingerprint = Column(String, unique=True, index=True, nullable=True)
     
     category_obj = relationship("Category", back_populates="transactions")
+    
+    __table_args__ = (
+        # Keyset pagination on (date, id) within one category. SQLite appends the rowid
+        # (id) to every index, so the plain date index above already covers (date, id).
+        Index("ix_transactions_category_date", "category_id", "date"),
+        # Amount-range filters: the range is a seek on amount and the page's (date, id)
+        # keys are sorted from the index entries, so only the page's rows are read
+        Index("ix_transactions_amount_date", "amount", "date"),
+    )
+
+class MonthlyCategoryRollup(Base):
+    """Pre-aggregated transaction totals per (year, month, category), maintained on write."""
+    __tablename__ = "monthly_category_rollups"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
+    total_amount = Column(Float, nullable=False, default=0.0)  # SUM(ABS(amount))
+    transaction_count = Column(Integer, nullable=False, default=0)
+    min_amount = Column(Float)
+    max_amount = Column(Float)
+    
+    __table_args__ = (UniqueConstraint("year", "month", "category_id"),)
+
+class UploadJob(Base):
+    """A CSV upload processed in the background, with progress persisted for polling."""
+    __tablename__ = "upload_jobs"
+    
+    id = Column(String, primary_key=True)
+    filename = Column(String)
+    source_path = Column(String)  # spooled copy of the upload, removed once processed
+    sha256 = Column(String)  # content hash, recorded in uploaded_files once the job completes
+    status = Column(String, nullable=False, default="queued")  # queued, running, completed, failed
+    bytes_total = Column(Integer, nullable=False, default=0)
+    bytes_read = Column(Integer, nullable=False, default=0)
+    rows_processed = Column(Integer, nullable=False, default=0)
+    rows_accepted = Column(Integer, nullable=False, default=0)
+    rows_rejected = Column(Integer, nullable=False, default=0)
+    rows_duplicate = Column(Integer, nullable=False, default=0)
+    error = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+class UploadedFile(Base):
+    """Content hash of every CSV ingested, so an identical file is refused before parsing."""
+    __tablename__ = "uploaded_files"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String, unique=True, index=True, nullable=False)
+    filename = Column(String)
+    size = Column(Integer)
+    rows_accepted = Column(Integer)
+    uploaded_at = Column(DateTime, default=datetime.utcnow)
 
 # Database setup
-SQLALCHEMY_DATABASE_URL = "sqlite:///./finance.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+# SQLite only (pragmas, FTS5, ON CONFLICT ... RETURNING). Deliberately not DATABASE_URL,
+# which hosting add-ons such as Heroku Postgres set to a server database.
+SQLALCHEMY_DATABASE_URL = os.getenv("SQLITE_DATABASE_URL", "sqlite:///./finance.db")
+
+# Connection pragmas per DB_PROFILE. "production" lets dashboard reads proceed while an
+# upload is writing (WAL), waits on locks instead of failing with "database is locked",
+# and trades fsync-per-commit for fsync-per-checkpoint (still safe against app crashes).
+SQLITE_PROFILES = {
+    "default": {},
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,       # ms
+        "cache_size": -65536,       # negative = KiB, i.e. 64 MiB page cache per connection
+        "mmap_size": 268435456,     # 256 MiB memory-mapped reads
+        "temp_store": "MEMORY",
+    },
+}
+DB_PROFILE = os.getenv("DB_PROFILE", "production")
+if DB_PROFILE not in SQLITE_PROFILES:
+    raise ValueError(f"Unknown DB_PROFILE {DB_PROFILE!r}; expected one of {sorted(SQLITE_PROFILES)}")
+
+def _create_engine(url: str):
+    database_url = make_url(url)
+    if database_url.get_backend_name() != "sqlite":
+        raise ValueError(
+            f"SQLITE_DATABASE_URL must be a sqlite:// URL, got {database_url.drivername}://; "
+            "this backend relies on SQLite pragmas, FTS5 and ON CONFLICT ... RETURNING"
+        )
+    in_memory = database_url.database in (None, "", ":memory:")
+    options = {"connect_args": {"check_same_thread": False}}
+    if not in_memory:
+        # Sized to cover the API worker threads (THREADPOOL_SIZE) plus upload jobs
+        options.update(
+            pool_size=int(os.getenv("DB_POOL_SIZE", 20)),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 30)),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", 30)),
+        )
+    db_engine = create_engine(url, **options)
+
+    pragmas = SQLITE_PROFILES[DB_PROFILE] if not in_memory else {}
+    if pragmas:
+        @event.listens_for(db_engine, "connect")
+        def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    return db_engine
+
+engine = _create_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+class TableVersions:
+    """Process-wide change counters per table, bumped when a session commits writes to it.
+
+    Counters restart at zero with the process, so anything persisted or sent to clients
+    should be qualified with `boot_id`. Tables not written since startup report the
+    startup time as their modification time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._modified = {}
+        self.boot_id = uuid.uuid4().hex
+        self.started_at = datetime.utcnow()
+
+    def get(self, table: str) -> int:
+        return self._versions.get(table, 0)
+
+    def modified_at(self, table: str) -> datetime:
+        """UTC time of the last committed write to `table` seen by this process."""
+        return self._modified.get(table, self.started_at)
+
+    def bump(self, *tables: str):
+        now = datetime.utcnow()
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+                self._modified[table] = now
+
+table_versions = TableVersions()
+
+@event.listens_for(SessionLocal, "after_flush")
+def _track_flushed_tables(session, flush_context):
+    changed = session.info.setdefault("changed_tables", set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        changed.add(obj.__table__.name)
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _track_executed_tables(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        changed = orm_execute_state.session.info.setdefault("changed_tables", set())
+        changed.add(orm_execute_state.statement.table.name)
+
+@event.listens_for(SessionLocal, "after_commit")
+def _bump_committed_tables(session):
+    table_versions.bump(*session.info.pop("changed_tables", ()))
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_rolled_back_tables(session):
+    session.info.pop("changed_tables", None)
+
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    # create_all skips existing tables, so add columns and indexes introduced since
+    # they were created (new NOT NULL columns need a scalar default)
+    existing_columns = {}
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing_columns[table.name] = {column["name"] for column in inspector.get_columns(table.name)}
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            for column in table.columns:
+                if column.name not in existing_columns[table.name]:
+                    ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column.type.compile(dialect=engine.dialect)}'
+                    if not column.nullable:
+                        if column.default is None or not column.default.is_scalar:
+                            raise RuntimeError(f"Cannot add NOT NULL column {table.name}.{column.name} without a default")
+                        ddl += f" NOT NULL DEFAULT {column.default.arg!r}"
+                    connection.exec_driver_sql(ddl)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as connection:
+            create_search_index(connection)
+
+# Full-text index over transaction descriptions (SQLite FTS5, external content: it
+# stores only the index and reads descriptions back from the transactions table)
+SEARCH_TABLE = "transactions_fts"
+
+SEARCH_INDEX_DDL = [
+    f"""CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(
+        description, content='transactions', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, description) VALUES (new.id, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, description) VALUES ('delete', old.id, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS transactions_fts_update AFTER UPDATE OF description ON transactions BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, description) VALUES ('delete', old.id, old.description);
+        INSERT INTO {SEARCH_TABLE}(rowid, description) VALUES (new.id, new.description);
+    END""",
+]
+
+def create_search_index(connection):
+    """Create the FTS5 table and its sync triggers, indexing existing rows the first time."""
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_TABLE,)
+    ).first()
+    if exists:
+        for ddl in SEARCH_INDEX_DDL[1:]:
+            connection.exec_driver_sql(ddl)
+        return
+    for ddl in SEARCH_INDEX_DDL:
+        connection.exec_driver_sql(ddl)
+    connection.exec_driver_sql(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')")
 
-def get_db():
+async def get_db():
+    # Async so that opening and closing run on the event loop: endpoints use the session
+    # from the worker thread pool, and a close that needed a free worker could deadlock
+    # against requests waiting for a pooled connection.
     db = SessionLocal()
     try:
         yield db
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional, List
 
@@ -27,6 +27,28 @@ class TransactionCreate(TransactionBase):
 class TransactionUpdate(BaseModel):
     category_id: Optional[int] = None
 
+class TransactionCategoryChange(BaseModel):
+    id: int
+    category_id: int
+
+class TransactionFilter(BaseModel):
+    category_id: Optional[int] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    min_amount: Optional[float] = None
+    max_amount: Optional[float] = None
+    # An empty prefix would match every row
+    description_prefix: Optional[str] = Field(None, min_length=1)
+
+class BulkTransactionUpdate(BaseModel):
+    # Either explicit (id, category_id) pairs, or a filter plus the category to move matches to
+    changes: Optional[List[TransactionCategoryChange]] = Field(None, max_length=10000)
+    filter: Optional[TransactionFilter] = None
+    category_id: Optional[int] = None
+
+class BulkTransactionUpdateResult(BaseModel):
+    updated_ids: List[int]
+
 class Transaction(TransactionBase):
     id: int
     category_obj: Optional[Category] = None
@@ -44,4 +66,10 @@ class CopilotQuery(BaseModel):
 
 class CopilotResponse(BaseModel):
     answer: str
-    data: Optional[dict] = None 
\ No newline at end of file
+    data: Optional[dict] = None
+
+class CopilotBatchQuery(BaseModel):
+    questions: List[str] = Field(..., max_length=100)
+
+class CopilotBatchResponse(BaseModel):
+    answers: List[CopilotResponse]
@@ -1,29 +1,148 @@
+import base64
+import copy
+import hashlib
+import io
+import json
+import logging
+import numpy as np
 import pandas as pd
 import re
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
-from sqlalchemy.orm import Session
-from models import Transaction, Category
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+from sqlalchemy import String, and_, bindparam, case, column, delete, extract, func, insert, literal, or_, select, table, text, true, tuple_, type_coerce, union_all, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Query, Session
+from models import SEARCH_TABLE, Transaction, Category, MonthlyCategoryRollup, UploadedFile, table_versions
 from schemas import ExpenseSummary
 
+# Id of the "Other" category, used when no keyword matches
+DEFAULT_CATEGORY_ID = 9
+
+# Columns an uploaded CSV must provide
+REQUIRED_COLUMNS = ['date', 'description', 'amount']
+
+# Stored row fingerprints are BLAKE2b-128 digests of one FINGERPRINT_RECORD per row (the
+# description as the BLAKE2b-128 of its normalized UTF-8 text). Only hashlib and a fixed
+# little-endian layout go into them, so they don't change with pandas or numpy versions;
+# changing the layout or FINGERPRINT_PERSON changes every fingerprint.
+FINGERPRINT_PERSON = b"txn-fingerprint3"
+FINGERPRINT_RECORD = np.dtype([
+    ('date_ns', '<i8'), ('description', 'u1', (16,)), ('cents', '<i8'), ('ordinal', '<i8')
+])
+DAY_NS = 86_400 * 10 ** 9
+
+# SQLite refuses compound SELECTs (UNION ALL chains) with more terms than this
+SQLITE_MAX_COMPOUND_SELECT = 500
+
+logger = logging.getLogger(__name__)
+
+class CSVFormatError(ValueError):
+    """Raised when an uploaded CSV cannot be ingested as transactions."""
+
+class KeywordMatcher:
+    """Matches descriptions against every category's keywords with one compiled regex.
+
+    Each category becomes a capture group inside a single lookahead alternation,
+    ordered by category priority, so at every position the regex reports the
+    highest-priority category with a keyword starting there. The overall winner
+    is the lowest group index seen, which keeps the first-category-wins order.
+    """
+
+    def __init__(self, categories: List[Tuple[int, Optional[str]]]):
+        self.category_ids = []
+        groups = []
+        for category_id, keywords in categories:
+            words = [kw.strip().lower() for kw in (keywords or '').split(',')]
+            words = [word for word in words if word]
+            if words:
+                self.category_ids.append(category_id)
+                groups.append('(' + '|'.join(re.escape(word) for word in words) + ')')
+        self._pattern = re.compile('(?=' + '|'.join(groups) + ')') if groups else None
+
+    def match(self, description: str) -> Optional[int]:
+        """Return the id of the first category with a keyword in `description`."""
+        if self._pattern is None:
+            return None
+        best = None
+        for match in self._pattern.finditer(description.lower()):
+            index = match.lastindex - 1
+            if best is None or index < best:
+                best = index
+                if best == 0:
+                    break
+        return self.category_ids[best] if best is not None else None
+
+    def match_many(self, descriptions: Iterable[str]) -> List[Optional[int]]:
+        """Match a batch of descriptions, scanning each distinct description only once."""
+        seen = {}
+        results = []
+        for description in descriptions:
+            if description not in seen:
+                seen[description] = self.match(description)
+            results.append(seen[description])
+        return results
+
+class CategorySnapshot:
+    """Immutable view of the categories table with lookup indexes and a compiled matcher."""
+
+    def __init__(self, version: int, rows: List[Tuple[int, str, Optional[str]]]):
+        self.version = version
+        self.name_to_id = {name: category_id for category_id, name, _ in rows}
+        self.id_to_name = {category_id: name for category_id, name, _ in rows}
+        # (id, name, keywords) in priority order, keywords already split and lowercased
+        self.keywords = [
+            (category_id, name, [kw for kw in (kw.strip().lower() for kw in (keywords or '').split(',')) if kw])
+            for category_id, name, keywords in rows
+        ]
+        self.matcher = KeywordMatcher([(category_id, keywords) for category_id, _, keywords in rows])
+
+class CategoryRegistry:
+    """Process-level category cache, reloaded only when the categories table version changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot: Optional[CategorySnapshot] = None
+
+    def get(self, db: Session) -> CategorySnapshot:
+        version = table_versions.get(Category.__tablename__)
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.version != version:
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is None or snapshot.version != version:
+                    rows = db.query(Category.id, Category.name, Category.keywords).order_by(Category.id).all()
+                    snapshot = self._snapshot = CategorySnapshot(version, rows)
+        return snapshot
+
+    def invalidate(self):
+        """Force the next get() to reload, e.g. after writes made outside a tracked session."""
+        self._snapshot = None
+
+category_registry = CategoryRegistry()
+
 class CategorizationService:
     def __init__(self, db: Session):
         self.db = db
+
+    @property
+    def matcher(self) -> KeywordMatcher:
+        return category_registry.get(self.db).matcher
+
+    def rebuild_matcher(self) -> KeywordMatcher:
+        """Recompile the keyword matcher from the current categories table."""
+        category_registry.invalidate()
+        return self.matcher
         
     def auto_categorize_transaction(self, description: str) -> Optional[int]:
         """Automatically categorize a transaction based on description keywords."""
-        categories = self.db.query(Category).all()
-        
-        description_lower = description.lower()
-        
-        for category in categories:
-            if category.keywords:
-                keywords = [kw.strip().lower() for kw in category.keywords.split(',')]
-                for keyword in keywords:
-                    if keyword in description_lower:
-                        return category.id
-        
-        return None
+        return self.matcher.match(description)
+
+    def categorize_many(self, descriptions: Iterable[str]) -> List[Optional[int]]:
+        """Categorize a batch of descriptions in one pass over the input."""
+        return self.matcher.match_many(descriptions)
     
     def create_default_categories(self):
         """Create default categories with common keywords."""
@@ -47,29 +166,1032 @@ class CategorizationService:
         
         self.db.commit()
 
+RollupKey = Tuple[int, int, Optional[int]]
+
+class RollupService:
+    """Maintains MonthlyCategoryRollup rows so dashboard totals never scan transactions."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def add(self, frame: pd.DataFrame):
+        """Fold newly inserted transactions (date, amount, category_id columns) into their buckets."""
+        if frame.empty:
+            return
+        dates = frame['date']
+        if not pd.api.types.is_datetime64_dtype(dates):
+            # Object or tz-aware columns have no (naive) .dt accessor; store naive UTC like the ingest
+            dates = pd.to_datetime(dates, utc=True).dt.tz_convert(None)
+        grouped = pd.DataFrame({
+            'year': dates.dt.year,
+            'month': dates.dt.month,
+            'category_id': frame['category_id'],
+            'abs_amount': frame['amount'].abs(),
+            'amount': frame['amount'],
+        }).groupby(['year', 'month', 'category_id'], dropna=False).agg(
+            total=('abs_amount', 'sum'),
+            count=('amount', 'size'),
+            min=('amount', 'min'),
+            max=('amount', 'max'),
+        )
+
+        existing = {
+            (row.year, row.month, row.category_id): row
+            for row in self.db.query(MonthlyCategoryRollup).filter(
+                tuple_(MonthlyCategoryRollup.year, MonthlyCategoryRollup.month).in_(
+                    sorted({(int(year), int(month)) for year, month, _ in grouped.index})
+                )
+            )
+        }
+        for (year, month, category_id), stats in grouped.iterrows():
+            key = (int(year), int(month), None if pd.isna(category_id) else int(category_id))
+            row = existing.get(key)
+            if row is None:
+                self.db.add(MonthlyCategoryRollup(
+                    year=key[0], month=key[1], category_id=key[2],
+                    total_amount=float(stats['total']),
+                    transaction_count=int(stats['count']),
+                    min_amount=float(stats['min']),
+                    max_amount=float(stats['max'])
+                ))
+            else:
+                row.total_amount += float(stats['total'])
+                row.transaction_count += int(stats['count'])
+                row.min_amount = min(row.min_amount, float(stats['min']))
+                row.max_amount = max(row.max_amount, float(stats['max']))
+        self.db.flush()
+
+    def refresh(self, keys: Iterable[RollupKey]):
+        """Recompute buckets from the transactions table, e.g. after rows left them.
+
+        Each bucket is one month of one category, so this is a bounded date-range query.
+        """
+        for year, month, category_id in set(keys):
+            start = datetime(year, month, 1)
+            end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+            category_match = Transaction.category_id.is_(None) if category_id is None \
+                else Transaction.category_id == category_id
+            total, count, min_amount, max_amount = self.db.query(
+                func.sum(func.abs(Transaction.amount)),
+                func.count(Transaction.id),
+                func.min(Transaction.amount),
+                func.max(Transaction.amount)
+            ).filter(Transaction.date >= start, Transaction.date < end, category_match).one()
+
+            row = self.db.query(MonthlyCategoryRollup).filter(
+                MonthlyCategoryRollup.year == year,
+                MonthlyCategoryRollup.month == month,
+                MonthlyCategoryRollup.category_id.is_(None) if category_id is None
+                else MonthlyCategoryRollup.category_id == category_id
+            ).first()
+            if not count:
+                if row is not None:
+                    self.db.delete(row)
+                continue
+            if row is None:
+                row = MonthlyCategoryRollup(year=year, month=month, category_id=category_id)
+                self.db.add(row)
+            row.total_amount = float(total)
+            row.transaction_count = int(count)
+            row.min_amount = float(min_amount)
+            row.max_amount = float(max_amount)
+        self.db.flush()
+
+    def move(self, transaction: Transaction, old_category_id: Optional[int]):
+        """Account for `transaction` having moved out of `old_category_id` into its current category."""
+        self.add(pd.DataFrame({
+            'date': pd.to_datetime([transaction.date]),
+            'amount': [transaction.amount],
+            'category_id': [transaction.category_id],
+        }))
+        self.refresh([(transaction.date.year, transaction.date.month, old_category_id)])
+
+    def move_many(self, moved: List[Tuple]):
+        """Account for (row, new_category_id) moves, where each row still has its old category_id."""
+        dated = [(row, target) for row, target in moved if row.date is not None]
+        if not dated:
+            return
+        self.add(pd.DataFrame({
+            'date': pd.to_datetime([row.date for row, _ in dated]),
+            'amount': [row.amount for row, _ in dated],
+            'category_id': [target for _, target in dated],
+        }))
+        self.refresh((row.date.year, row.date.month, row.category_id) for row, _ in dated)
+
+    def rebuild(self):
+        """Recreate every bucket from the transactions table in one INSERT ... SELECT."""
+        year = extract('year', Transaction.date)
+        month = extract('month', Transaction.date)
+        self.db.execute(delete(MonthlyCategoryRollup))
+        self.db.execute(insert(MonthlyCategoryRollup).from_select(
+            ['year', 'month', 'category_id', 'total_amount', 'transaction_count', 'min_amount', 'max_amount'],
+            select(
+                year, month, Transaction.category_id,
+                func.sum(func.abs(Transaction.amount)),
+                func.count(Transaction.id),
+                func.min(Transaction.amount),
+                func.max(Transaction.amount)
+            ).where(Transaction.date.is_not(None)).group_by(year, month, Transaction.category_id)
+        ))
+        self.db.commit()
+
+    def ensure_built(self):
+        """Backfill the rollup for databases that predate it."""
+        has_rollup = self.db.query(MonthlyCategoryRollup.id).first() is not None
+        has_transactions = self.db.query(Transaction.id).first() is not None
+        if has_transactions and not has_rollup:
+            self.rebuild()
+
+def begin_write(db: Session):
+    """Open the session's write transaction before reading rows it is about to change.
+
+    pysqlite only begins a transaction at the first write, so a SELECT would otherwise
+    run outside it and rows committed in between (e.g. by an upload job or another
+    recategorization) could be updated from stale values and leave the rollup wrong.
+    BEGIN IMMEDIATE takes the write lock up front, so the rows read are exactly the
+    rows the UPDATE changes. The lock is held until the session commits or rolls back.
+    """
+    dbapi_connection = db.connection().connection.dbapi_connection
+    if not dbapi_connection.in_transaction:
+        dbapi_connection.execute("BEGIN IMMEDIATE")
+
+class RecategorizationService:
+    """Re-runs the keyword matcher over stored transactions after categories change.
+
+    Transactions are read in id-ordered keyset batches, so memory stays bounded by
+    `batch_size`, and each batch is read under the write lock, applied with one UPDATE
+    per target category and committed together with its rollup adjustments. Rows no keyword matches keep
+    their current category (uncategorized rows move to the default one), so manual
+    assignments without a keyword are not discarded.
+    """
+
+    SCOPES = ('all', 'uncategorized')
+
+    def __init__(self, db: Session, batch_size: int = 5000, sample_size: int = 20):
+        self.db = db
+        self.batch_size = batch_size
+        self.sample_size = sample_size
+        self.rollup = RollupService(db)
+
+    def recategorize(self, scope: str = 'all', dry_run: bool = False) -> Dict:
+        """Recategorize transactions in `scope`; with `dry_run` only report what would change."""
+        if scope not in self.SCOPES:
+            raise ValueError(f"Unknown scope: {scope}")
+        snapshot = category_registry.get(self.db)
+        scanned = 0
+        changes: Dict[Tuple[Optional[int], int], int] = {}
+        samples = []
+
+        for batch in self._batches(scope, lock=not dry_run):
+            scanned += len(batch)
+            targets = snapshot.matcher.match_many(row.description or '' for row in batch)
+            moved = []
+            for row, target in zip(batch, targets):
+                if target is None:
+                    target = row.category_id if row.category_id is not None else DEFAULT_CATEGORY_ID
+                if target == row.category_id:
+                    continue
+                moved.append((row, target))
+                changes[(row.category_id, target)] = changes.get((row.category_id, target), 0) + 1
+                if len(samples) < self.sample_size:
+                    samples.append({
+                        "id": row.id,
+                        "description": row.description,
+                        "from": snapshot.id_to_name.get(row.category_id),
+                        "to": snapshot.id_to_name.get(target),
+                    })
+            if not dry_run:
+                # Commits, releasing the write lock taken for this batch
+                self._apply(moved)
+
+        return {
+            "scope": scope,
+            "dry_run": dry_run,
+            "scanned": scanned,
+            "changed": sum(changes.values()),
+            "changes": [
+                {
+                    "from": snapshot.id_to_name.get(old_id),
+                    "to": snapshot.id_to_name.get(new_id),
+                    "count": count,
+                }
+                for (old_id, new_id), count in sorted(changes.items(), key=lambda item: -item[1])
+            ],
+            "samples": samples,
+        }
+
+    def _batches(self, scope: str, lock: bool = False) -> Iterator[List]:
+        """Yield (id, date, amount, description, category_id) rows in id order, `batch_size` at a time.
+
+        With `lock`, each batch is read after taking the write lock (see begin_write),
+        which the caller releases by committing before asking for the next batch.
+        """
+        last_id = 0
+        while True:
+            if lock:
+                begin_write(self.db)
+            query = self.db.query(
+                Transaction.id, Transaction.date, Transaction.amount,
+                Transaction.description, Transaction.category_id
+            ).filter(Transaction.id > last_id)
+            if scope == 'uncategorized':
+                query = query.filter(
+                    Transaction.category_id.is_(None) | (Transaction.category_id == DEFAULT_CATEGORY_ID)
+                )
+            batch = query.order_by(Transaction.id).limit(self.batch_size).all()
+            if not batch:
+                if lock:
+                    self.db.rollback()
+                return
+            yield batch
+            last_id = batch[-1].id
+
+    def _apply(self, moved: List[Tuple]):
+        """Write one batch of moves with set-based UPDATEs, adjust the affected rollup buckets and commit."""
+        ids_by_target: Dict[int, List[int]] = {}
+        for row, target in moved:
+            ids_by_target.setdefault(target, []).append(row.id)
+        for target, ids in ids_by_target.items():
+            self.db.execute(
+                update(Transaction).where(Transaction.id.in_(ids)).values(category_id=target),
+                execution_options={"synchronize_session": False}
+            )
+        self.rollup.move_many(moved)
+        self.db.commit()
+
+class BulkCategoryUpdateService:
+    """Moves many transactions to new categories with one UPDATE in one transaction."""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.rollup = RollupService(db)
+
+    def unknown_categories(self, category_ids: Iterable[int]) -> List[int]:
+        """Ids among `category_ids` that don't exist, checked against the cached category registry."""
+        known = category_registry.get(self.db).id_to_name
+        return sorted(set(category_ids) - known.keys())
+
+    def apply_changes(self, changes: Dict[int, int]) -> List[int]:
+        """Set each transaction id in `changes` to its category id; returns the ids that changed."""
+        begin_write(self.db)
+        rows = self.db.query(
+            Transaction.id, Transaction.date, Transaction.amount, Transaction.category_id
+        ).filter(Transaction.id.in_(list(changes))).all()
+        moved = [(row, changes[row.id]) for row in rows if row.category_id != changes[row.id]]
+        if moved:
+            self.db.execute(
+                update(Transaction)
+                .where(Transaction.id.in_([row.id for row, _ in moved]))
+                .values(category_id=case({row.id: target for row, target in moved}, value=Transaction.id)),
+                execution_options={"synchronize_session": False}
+            )
+        return self._finish(moved)
+
+    def apply_filter(self, filters: Dict, category_id: int) -> List[int]:
+        """Move every transaction matching `filters` (see filter_transactions) to `category_id`."""
+        begin_write(self.db)
+        query = filter_transactions(self.db.query(Transaction), **filters)\
+            .filter(Transaction.category_id.is_distinct_from(category_id))
+        rows = query.with_entities(
+            Transaction.id, Transaction.date, Transaction.amount, Transaction.category_id
+        ).all()
+        moved = [(row, category_id) for row in rows]
+        if moved:
+            query.update({Transaction.category_id: category_id}, synchronize_session=False)
+        return self._finish(moved)
+
+    def _finish(self, moved: List[Tuple]) -> List[int]:
+        self.rollup.move_many(moved)
+        self.db.commit()
+        return sorted(row.id for row, _ in moved)
+
+def filter_transactions(
+    query: Query,
+    category_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+    description_prefix: Optional[str] = None
+) -> Query:
+    """Apply the optional transaction filters shared by the list, export and bulk endpoints.
+
+    A filter is skipped only when it is None; falsy values such as category_id=0 still
+    restrict the query.
+    """
+    if category_id is not None:
+        query = query.filter(Transaction.category_id == category_id)
+    if start_date is not None:
+        query = query.filter(Transaction.date >= start_date)
+    if end_date is not None:
+        query = query.filter(Transaction.date <= end_date)
+    if min_amount is not None:
+        query = query.filter(Transaction.amount >= min_amount)
+    if max_amount is not None:
+        query = query.filter(Transaction.amount <= max_amount)
+    if description_prefix is not None:
+        if not description_prefix:
+            raise ValueError("description_prefix must not be empty")
+        # A half-open range instead of LIKE so the description index can serve it (case-sensitive)
+        query = query.filter(
+            Transaction.description >= description_prefix,
+            Transaction.description < description_prefix + chr(0x10FFFF)
+        )
+    return query
+
+def search_match_expression(search: str) -> Optional[str]:
+    """Turn free text into an FTS5 query: every word must appear, as a word or word prefix.
+
+    Words are quoted, so operators and punctuation in the input are matched literally
+    instead of being parsed as FTS5 syntax.
+    """
+    words = re.findall(r'\w+', search.lower())
+    return ' '.join(f'"{word}"*' for word in words) or None
+
+def search_transactions(query: Query, search: str, limit: int = 100, skip: int = 0) -> List[Transaction]:
+    """Return transactions whose description matches `search`, best matches first.
+
+    On SQLite this is served by the FTS5 index and ranked by bm25; other databases
+    fall back to substring matching, newest first.
+    """
+    match = search_match_expression(search)
+    if match is None:
+        return []
+    if query.session.get_bind().dialect.name == "sqlite":
+        fts = table(SEARCH_TABLE, column('rowid'), column('rank'))
+        query = query.join(fts, fts.c.rowid == Transaction.id)\
+            .filter(text(f"{SEARCH_TABLE} MATCH :match").bindparams(match=match))\
+            .order_by(fts.c.rank, Transaction.id)
+    else:
+        for word in re.findall(r'\w+', search):
+            query = query.filter(Transaction.description.ilike(f"%{word}%"))
+        query = query.order_by(Transaction.date.desc(), Transaction.id.desc())
+    return query.offset(skip).limit(limit).all()
+
+class PageCursor:
+    """Opaque keyset position: the (date, id) of a boundary row and the direction to read from it."""
+
+    def __init__(self, date: datetime, id: int, backward: bool = False):
+        self.date = date
+        self.id = id
+        self.backward = backward
+
+    @classmethod
+    def from_row(cls, transaction: Transaction, backward: bool = False) -> "PageCursor":
+        return cls(transaction.date, transaction.id, backward)
+
+    def encode(self) -> str:
+        payload = json.dumps({"d": self.date.isoformat(), "i": self.id, "b": int(self.backward)})
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+    @classmethod
+    def decode(cls, token: str) -> "PageCursor":
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+            return cls(datetime.fromisoformat(payload["d"]), int(payload["i"]), bool(payload["b"]))
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError("Invalid pagination cursor") from e
+
+def paginate_transactions(
+    query: Query,
+    limit: int,
+    cursor: Optional[PageCursor] = None,
+    descending: bool = True,
+    skip: int = 0,
+    row_query: Optional[Query] = None
+) -> Tuple[List[Transaction], Optional[PageCursor], Optional[PageCursor]]:
+    """Return one page ordered by (date, id) plus next/prev cursors (None at either end).
+
+    Pages are located with a row-value comparison on the (date, id) key, so the
+    cost of a page does not depend on how deep it is. `skip` is only honoured
+    without a cursor, for callers still using offset paging.
+
+    `query` carries the filters and only its ids are read; the page's rows are
+    then loaded by id through `row_query` (e.g. with eager-load options), which
+    defaults to a plain Transaction query.
+    """
+    key = tuple_(Transaction.date, Transaction.id)
+    backward = cursor.backward if cursor else False
+    scan_descending = descending != backward
+
+    if cursor:
+        position = tuple_(cursor.date, cursor.id)
+        query = query.filter(key < position if scan_descending else key > position)
+    if scan_descending:
+        order = (Transaction.date.desc(), Transaction.id.desc())
+    else:
+        order = (Transaction.date.asc(), Transaction.id.asc())
+
+    # Find the page's ids first and load full rows (and joined categories) for those
+    # alone: when an index only serves the filters, e.g. (amount, date) for an amount
+    # range, the matches are sorted as index entries instead of as whole joined rows
+    page_ids = query.with_entities(Transaction.id).order_by(*order).limit(limit + 1)
+    if skip and not cursor:
+        page_ids = page_ids.offset(skip)
+    if row_query is None:
+        row_query = query.session.query(Transaction)
+    rows = row_query.filter(Transaction.id.in_(page_ids.subquery().select())).order_by(*order).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+    if not rows:
+        return rows, None, None
+
+    has_next = has_more if not backward else True
+    has_prev = has_more if backward else (cursor is not None or skip > 0)
+    next_cursor = PageCursor.from_row(rows[-1]) if has_next else None
+    prev_cursor = PageCursor.from_row(rows[0], backward=True) if has_prev else None
+    return rows, next_cursor, prev_cursor
+
+class TransactionIngestService:
+    """Columnar CSV ingest: validates, categorizes and bulk-inserts a whole DataFrame.
+
+    Every row carries a fingerprint of (date, normalized description, amount,
+    occurrence ordinal), stored in a unique column. Rows already present are
+    skipped by the insert itself, so re-uploading an export is a cheap no-op
+    while genuinely repeated rows within one file (two identical coffees on the
+    same day) are kept apart by their ordinal.
+    """
+
+    def __init__(self, db: Session, chunk_size: int = 5000):
+        self.db = db
+        self.chunk_size = max(1, chunk_size)
+        self.categorization_service = CategorizationService(db)
+        self.rollup_service = RollupService(db)
+        self._reset_occurrences()
+
+    def ingest_dataframe(self, df: pd.DataFrame) -> Dict:
+        """Insert all valid, not yet stored rows of `df`; report accepted/duplicate/rejected counts and stage timings (ms)."""
+        timings = {}
+
+        start = time.perf_counter()
+        dates = self._parse_dates(df['date'])
+        amounts = pd.to_numeric(df['amount'], errors='coerce')
+        descriptions = df['description']
+        valid = dates.notna() & amounts.notna() & descriptions.notna()
+        frame = pd.DataFrame({
+            'date': dates[valid],
+            'description': descriptions[valid].astype(str),
+            'amount': amounts[valid].astype(float),
+        })
+        frame['fingerprint'] = self._fingerprints(frame)
+        timings['parse_ms'] = self._elapsed_ms(start)
+
+        start = time.perf_counter()
+        frame['category_id'] = self._categorize(frame['description'])
+        timings['categorize_ms'] = self._elapsed_ms(start)
+
+        start = time.perf_counter()
+        table = Transaction.__table__
+        statement = sqlite_insert(table).on_conflict_do_nothing(index_elements=[table.c.fingerprint])\
+            .returning(table.c.fingerprint)
+        records = frame.to_dict('records')
+        inserted = []
+        for offset in range(0, len(records), self.chunk_size):
+            inserted.extend(self.db.execute(statement, records[offset:offset + self.chunk_size]).scalars())
+        timings['insert_ms'] = self._elapsed_ms(start)
+
+        start = time.perf_counter()
+        # Only rows that were actually inserted count towards the rollup; fingerprints are
+        # unique within the frame, so they identify those rows without reading them back
+        if len(inserted) < len(frame):
+            frame = frame[frame['fingerprint'].isin(inserted)]
+        self.rollup_service.add(frame)
+        self.db.commit()
+        timings['rollup_ms'] = self._elapsed_ms(start)
+
+        return {
+            "accepted": len(inserted),
+            "duplicates": len(records) - len(inserted),
+            "rejected": int(len(df) - len(records)),
+            "timings": timings
+        }
+
+    def _fingerprints(self, frame: pd.DataFrame) -> List[str]:
+        """128-bit hex fingerprint per row, see FINGERPRINT_RECORD.
+
+        The ordinal counts identical rows seen earlier in this upload, so two identical
+        coffees on one day get different fingerprints while a re-upload reproduces them.
+        """
+        # Exports repeat a limited set of descriptions, so normalize and hash each distinct one once
+        codes, descriptions = pd.factorize(frame['description'])
+        normalized = pd.Series(descriptions, dtype=object).str.lower().str.split().str.join(' ')
+        description_digests = np.frombuffer(
+            b''.join(hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest() for text in normalized),
+            dtype=np.uint8
+        ).reshape(-1, 16)[codes]
+
+        records = np.zeros(len(frame), dtype=FINGERPRINT_RECORD)
+        records['date_ns'] = frame['date'].values.astype('datetime64[ns]').astype('int64')
+        records['description'] = description_digests
+        records['cents'] = (frame['amount'] * 100).round().astype('int64').values
+        # Identical rows share a key; it only lives for this upload, so pandas' hashing is fine here
+        keys = pd.util.hash_pandas_object(pd.DataFrame({
+            'date': records['date_ns'],
+            'description': description_digests[:, :8].copy().view('<u8').ravel(),
+            'cents': records['cents'],
+        }), index=False).values
+        records['ordinal'] = self._ordinals(keys, records['date_ns'] // DAY_NS)
+
+        data = memoryview(records.tobytes())
+        size = FINGERPRINT_RECORD.itemsize
+        blake2b = hashlib.blake2b
+        return [
+            blake2b(data[offset:offset + size], digest_size=16, person=FINGERPRINT_PERSON).hexdigest()
+            for offset in range(0, len(data), size)
+        ]
+
+    def _ordinals(self, keys: np.ndarray, days: np.ndarray) -> np.ndarray:
+        """Occurrence ordinal of each row among identical rows (equal `keys`) of this upload.
+
+        Counts carry over between streamed chunks. When the upload's days are known to be
+        contiguous (see _days_grouped), counts for days the current chunk doesn't touch are
+        dropped, since those days cannot come back; the state then stays about one chunk in
+        size. Otherwise every count is kept for the whole upload, because a day seen again
+        after its counts were dropped would restart at ordinal 0 and lose rows as duplicates.
+        """
+        codes, unique_keys = pd.factorize(keys)
+        chunk_days = pd.unique(days)
+        if self._evict_days and np.isin(chunk_days, self._evicted_days).any():
+            raise RuntimeError("Upload days are not contiguous although the pre-scan found them so")
+
+        seen = self._occurrence_keys.get_indexer(unique_keys)
+        prior = np.zeros(len(unique_keys), dtype='int64')
+        prior[seen >= 0] = self._occurrence_counts[seen[seen >= 0]]
+        ordinals = pd.Series(codes).groupby(codes).cumcount().values + prior[codes]
+
+        # Entries of earlier chunks that this chunk didn't touch carry over as they are
+        carry = np.ones(len(self._occurrence_keys), dtype=bool)
+        carry[seen[seen >= 0]] = False
+        if self._evict_days:
+            current = np.isin(self._occurrence_days, chunk_days)
+            self._evicted_days = np.union1d(self._evicted_days, self._occurrence_days[carry & ~current])
+            carry &= current
+        first_rows = np.flatnonzero(~pd.Series(codes).duplicated().values)
+        self._occurrence_keys = self._occurrence_keys[carry].append(pd.Index(unique_keys))
+        self._occurrence_counts = np.concatenate(
+            [self._occurrence_counts[carry], np.bincount(codes, minlength=len(unique_keys)) + prior]
+        )
+        self._occurrence_days = np.concatenate([self._occurrence_days[carry], days[first_rows]])
+        return ordinals
+
+    def _reset_occurrences(self, evict_days: bool = False):
+        # Identical-row counts per key and the day of each, carried across streamed chunks
+        self._occurrence_keys = pd.Index(np.empty(0, dtype='uint64'))
+        self._occurrence_counts = np.empty(0, dtype='int64')
+        self._occurrence_days = np.empty(0, dtype='int64')
+        self._evicted_days = np.empty(0, dtype='int64')
+        self._evict_days = evict_days
+
+    def _days_grouped(self, fileobj: BinaryIO, chunk_rows: int) -> bool:
+        """True if every day's rows are contiguous in the CSV, as in date-sorted bank exports.
+
+        Reads only the date column and rewinds; the state is one entry per distinct day.
+        Unreadable or unseekable input counts as not grouped (the ingest reports the error).
+        """
+        try:
+            start = fileobj.tell()
+        except (AttributeError, OSError, ValueError):
+            return False
+        finished = set()
+        current = None
+        try:
+            # Closing the reader explicitly detaches it from `fileobj`; leaving it to the
+            # garbage collector would close the caller's file
+            with pd.read_csv(fileobj, encoding='utf-8', usecols=['date'], chunksize=chunk_rows) as chunks:
+                for chunk in chunks:
+                    days = self._parse_dates(chunk['date']).dropna().values.astype('int64') // DAY_NS
+                    if not len(days):
+                        continue
+                    run_days = days[np.r_[0, np.flatnonzero(np.diff(days)) + 1]].tolist()
+                    if run_days[0] == current:
+                        run_days = run_days[1:]
+                    elif current is not None:
+                        finished.add(current)
+                    if len(set(run_days)) != len(run_days) or not finished.isdisjoint(run_days):
+                        return False
+                    if run_days:
+                        finished.update(run_days[:-1])
+                        current = run_days[-1]
+        except ValueError:
+            return False
+        finally:
+            fileobj.seek(start)
+        return True
+
+    def backfill_fingerprints(self, batch_size: int = 50000) -> int:
+        """Fingerprint rows stored before fingerprints existed; returns how many were filled.
+
+        The rows are fingerprinted as one upload in id order, so re-uploading an export
+        that is already stored finds its rows instead of inserting them a second time.
+        A row whose fingerprint is already taken keeps NULL.
+        """
+        self._reset_occurrences()
+        table = Transaction.__table__
+        statement = update(table).where(table.c.id == bindparam('row_id'))\
+            .values(fingerprint=bindparam('row_fingerprint')).prefix_with('OR IGNORE')
+        filled = 0
+        last_id = 0
+        while True:
+            rows = self.db.query(Transaction.id, Transaction.date, Transaction.description, Transaction.amount)\
+                .filter(
+                    Transaction.id > last_id, Transaction.fingerprint.is_(None), Transaction.date.is_not(None),
+                    Transaction.description.is_not(None), Transaction.amount.is_not(None)
+                ).order_by(Transaction.id).limit(batch_size).all()
+            if not rows:
+                break
+            frame = pd.DataFrame(rows, columns=['id', 'date', 'description', 'amount'])
+            frame['date'] = pd.to_datetime(frame['date'])
+            frame['fingerprint'] = self._fingerprints(frame)
+            filled += self.db.execute(statement, [
+                {'row_id': row_id, 'row_fingerprint': fingerprint}
+                for row_id, fingerprint in zip(frame['id'].tolist(), frame['fingerprint'])
+            ]).rowcount
+            self.db.commit()
+            last_id = rows[-1].id
+        self._reset_occurrences()
+        if filled:
+            logger.info("Backfilled fingerprints of %d stored transactions", filled)
+        return filled
+
+    @staticmethod
+    def file_sha256(fileobj: BinaryIO) -> str:
+        """Hash an upload in 1 MiB blocks and rewind it."""
+        digest = hashlib.sha256()
+        for block in iter(lambda: fileobj.read(1024 * 1024), b''):
+            digest.update(block)
+        fileobj.seek(0)
+        return digest.hexdigest()
+
+    def is_known_file(self, sha256: str) -> bool:
+        return self.db.query(UploadedFile.id).filter(UploadedFile.sha256 == sha256).first() is not None
+
+    def record_file(self, sha256: str, filename: str, size: int, rows_accepted: int):
+        """Remember a fully ingested file so identical re-uploads are refused up front."""
+        self.db.execute(
+            sqlite_insert(UploadedFile).values(
+                sha256=sha256, filename=filename, size=size,
+                rows_accepted=rows_accepted, uploaded_at=datetime.utcnow()
+            ).on_conflict_do_nothing(index_elements=['sha256'])
+        )
+        self.db.commit()
+
+    def _parse_dates(self, column: pd.Series) -> pd.Series:
+        """Parse a date column to naive UTC, retrying rows that don't match the inferred format individually.
+
+        Timestamps with UTC offsets are converted to UTC; without utc=True, offsets that
+        differ (e.g. across a DST change) would leave an object column instead of datetime64.
+        """
+        dates = pd.to_datetime(column, errors='coerce', utc=True)
+        retry = dates.isna() & column.notna()
+        if retry.any():
+            dates[retry] = pd.to_datetime(column[retry], errors='coerce', format='mixed', utc=True)
+        return dates.dt.tz_convert(None)
+
+    def _categorize(self, descriptions: pd.Series) -> pd.Series:
+        """Categorize the whole description column, falling back to the default category."""
+        category_ids = self.categorization_service.categorize_many(descriptions.tolist())
+        return pd.Series(category_ids, index=descriptions.index, dtype=object)\
+            .fillna(DEFAULT_CATEGORY_ID).astype(int)
+
+    @staticmethod
+    def validate_header(fileobj: BinaryIO):
+        """Check the CSV header for the required columns without parsing any rows."""
+        try:
+            columns = pd.read_csv(fileobj, encoding='utf-8', nrows=0).columns
+        except pd.errors.EmptyDataError:
+            raise CSVFormatError("Uploaded file is empty")
+        except (UnicodeDecodeError, pd.errors.ParserError) as e:
+            raise CSVFormatError(f"Uploaded file is not a readable UTF-8 CSV: {e}")
+        finally:
+            fileobj.seek(0)
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in columns]
+        if missing_columns:
+            raise CSVFormatError(f"Missing required columns: {missing_columns}")
+
+    def ingest_csv(
+        self,
+        fileobj: BinaryIO,
+        chunk_rows: Optional[int] = None,
+        progress: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """Ingest a CSV file object, optionally streaming it `chunk_rows` rows at a time.
+
+        In streaming mode only one chunk is held in memory and each chunk is
+        committed on its own, so peak memory follows the chunk size rather than
+        the file size. `progress` is called with running totals after every chunk.
+        """
+        totals = {"accepted": 0, "duplicates": 0, "rejected": 0, "chunks": 0, "timings": {"read_ms": 0.0}}
+
+        start = time.perf_counter()
+        # Identical-row counts can only be dropped per day if no day comes back later in the file
+        self._reset_occurrences(evict_days=bool(chunk_rows) and self._days_grouped(fileobj, chunk_rows))
+        for df in self._read_chunks(fileobj, chunk_rows):
+            totals["timings"]["read_ms"] += self._elapsed_ms(start)
+            if totals["chunks"] == 0:
+                missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+                if missing_columns:
+                    raise CSVFormatError(f"Missing required columns: {missing_columns}")
+
+            result = self.ingest_dataframe(df)
+            totals["accepted"] += result["accepted"]
+            totals["duplicates"] += result["duplicates"]
+            totals["rejected"] += result["rejected"]
+            totals["chunks"] += 1
+            for stage, elapsed in result["timings"].items():
+                totals["timings"][stage] = totals["timings"].get(stage, 0.0) + elapsed
+
+            if progress:
+                progress({
+                    "rows_processed": totals["accepted"] + totals["duplicates"] + totals["rejected"],
+                    "rows_accepted": totals["accepted"],
+                    "rows_duplicate": totals["duplicates"],
+                    "rows_rejected": totals["rejected"],
+                    "bytes_read": self._position(fileobj),
+                    "chunks": totals["chunks"]
+                })
+            start = time.perf_counter()
+
+        totals["timings"] = {stage: round(elapsed, 2) for stage, elapsed in totals["timings"].items()}
+        return totals
+
+    @staticmethod
+    def _read_chunks(fileobj: BinaryIO, chunk_rows: Optional[int]) -> Iterator[pd.DataFrame]:
+        """Read the CSV whole or `chunk_rows` rows at a time; undecodable or malformed input raises CSVFormatError."""
+        try:
+            if chunk_rows:
+                with pd.read_csv(fileobj, encoding='utf-8', chunksize=chunk_rows) as chunks:
+                    yield from chunks
+            else:
+                yield pd.read_csv(fileobj, encoding='utf-8')
+        except (UnicodeDecodeError, pd.errors.ParserError) as e:
+            raise CSVFormatError(f"Uploaded file is not a readable UTF-8 CSV: {e}")
+
+    @staticmethod
+    def _position(fileobj: BinaryIO) -> Optional[int]:
+        try:
+            return fileobj.tell()
+        except (AttributeError, OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _elapsed_ms(start: float) -> float:
+        return round((time.perf_counter() - start) * 1000, 2)
+
+class TransactionExportService:
+    """Streams transactions joined with category names as Parquet or Arrow IPC.
+
+    Rows are pulled from the DB cursor `batch_size` at a time and each batch becomes
+    one Arrow record batch (one Parquet row group), so memory is bounded by the batch
+    however large the export. pyarrow is imported on first use.
+    """
+
+    FORMATS = {
+        "parquet": ("application/vnd.apache.parquet", "parquet"),
+        "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+    }
+
+    def __init__(self, db: Session, batch_size: int = 50000):
+        self.db = db
+        self.batch_size = batch_size
+
+    @staticmethod
+    def schema():
+        import pyarrow as pa
+        return pa.schema([
+            ("id", pa.int64()),
+            ("date", pa.timestamp("us")),
+            ("description", pa.string()),
+            ("amount", pa.float64()),
+            ("category_id", pa.int64()),
+            ("category", pa.string()),
+        ])
+
+    def query(self, **filters) -> Query:
+        """Transactions with their category name, filtered like the list endpoint, in id order.
+
+        Id order is a sequential scan of the table; dates are selected as stored text
+        and parsed by Arrow per batch rather than per row.
+        """
+        query = self.db.query(
+            Transaction.id, type_coerce(Transaction.date, String), Transaction.description,
+            Transaction.amount, Transaction.category_id, Category.name
+        ).outerjoin(Category, Category.id == Transaction.category_id)
+        return filter_transactions(query, **filters).order_by(Transaction.id)
+
+    def record_batches(self, query: Query) -> Iterator:
+        import pyarrow as pa
+        schema = self.schema()
+        connection = self.db.connection().execution_options(yield_per=self.batch_size)
+        for rows in connection.execute(query.statement).partitions():
+            columns = list(zip(*rows))
+            arrays = []
+            for values, field in zip(columns, schema):
+                if field.name == "date":
+                    arrays.append(pa.array(values, type=pa.string()).cast(field.type))
+                else:
+                    arrays.append(pa.array(values, type=field.type))
+            yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    def stream(self, export_format: str, query: Query) -> Iterator[bytes]:
+        """Yield the encoded export chunk by chunk, one chunk per record batch."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        sink = io.BytesIO()
+        if export_format == "parquet":
+            writer = pq.ParquetWriter(sink, self.schema())
+        else:
+            writer = pa.ipc.new_stream(sink, self.schema())
+
+        def drain() -> bytes:
+            data = sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+            return data
+
+        try:
+            for batch in self.record_batches(query):
+                writer.write_batch(batch)
+                yield drain()
+        finally:
+            writer.close()
+        yield drain()
+
+class QueryPlan(NamedTuple):
+    """A parsed copilot question: what to compute, for which category and time window."""
+    intent: str
+    category: Optional[str]
+    start: Optional[datetime]
+    end: Optional[datetime]
+    period: Optional[str]
+
+    @property
+    def time_filter(self) -> Optional[Dict]:
+        if self.period is None:
+            return None
+        return {"start": self.start, "end": self.end, "period": self.period}
+
+class CopilotCache:
+    """LRU caches for copilot query plans and answers, with hit/miss counters.
+
+    Plans are keyed by the normalized question, the day and the categories version,
+    since relative periods and category names are resolved when the plan is built
+    (a "this month" window therefore ends when it was first planned that day).
+    Answers are keyed by plan and the versions of the tables they read, so any
+    committed upload, edit or category change makes earlier answers unreachable.
+    """
+
+    def __init__(self, max_plans: int = 1024, max_results: int = 1024):
+        self.max_plans = max_plans
+        self.max_results = max_results
+        self._lock = threading.Lock()
+        self._plans: OrderedDict = OrderedDict()
+        self._results: OrderedDict = OrderedDict()
+        self._counters = {"plan_hits": 0, "plan_misses": 0, "result_hits": 0, "result_misses": 0}
+
+    def plan(self, key: Tuple, build: Callable[[], QueryPlan]) -> QueryPlan:
+        plan = self._get(self._plans, "plan", key)
+        if plan is None:
+            plan = build()
+            self._put(self._plans, self.max_plans, key, plan)
+        return plan
+
+    def result(self, key: Tuple, compute: Callable[[], Dict]) -> Dict:
+        result = self.get_result(key)
+        if result is None:
+            result = compute()
+            self.put_result(key, copy.deepcopy(result))
+        return result
+
+    def get_result(self, key: Tuple) -> Optional[Dict]:
+        """Return a copy of the cached answer for `key`, or None (counted as a miss)."""
+        result = self._get(self._results, "result", key)
+        return copy.deepcopy(result) if result is not None else None
+
+    def put_result(self, key: Tuple, result: Dict):
+        self._put(self._results, self.max_results, key, result)
+
+    def _get(self, entries: OrderedDict, kind: str, key: Tuple):
+        with self._lock:
+            value = entries.get(key)
+            if value is None:
+                self._counters[f"{kind}_misses"] += 1
+            else:
+                entries.move_to_end(key)
+                self._counters[f"{kind}_hits"] += 1
+            return value
+
+    def _put(self, entries: OrderedDict, max_size: int, key: Tuple, value):
+        with self._lock:
+            entries[key] = value
+            entries.move_to_end(key)
+            while len(entries) > max_size:
+                entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._counters, "plans": len(self._plans), "results": len(self._results)}
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+            self._results.clear()
+
+copilot_cache = CopilotCache()
+
 class CopilotService:
     def __init__(self, db: Session):
         self.db = db
+        self.categories = category_registry.get(db)
     
     def process_query(self, question: str) -> Dict:
         """Process natural language queries about expenses."""
-        question_lower = question.lower()
-        
+        plan = self.plan(question)
+        return copilot_cache.result((plan, self._data_version()), lambda: self.execute(plan))
+
+    def process_batch(self, questions: List[str]) -> List[Dict]:
+        """Answer several questions at once, in input order.
+
+        Uncached amount, count and summary questions are answered from one aggregate
+        query that groups by category with a SUM/COUNT column pair per distinct time
+        window; biggest-purchase questions share UNION ALL lookups of up to
+        SQLITE_MAX_COMPOUND_SELECT plans each.
+        """
+        plans = [self.plan(question) for question in questions]
+        data_version = self._data_version()
+        answers: Dict[QueryPlan, Dict] = {}
+        for plan in plans:
+            if plan not in answers:
+                cached = copilot_cache.get_result((plan, data_version))
+                if cached is not None:
+                    answers[plan] = cached
+        pending = [plan for plan in dict.fromkeys(plans) if plan not in answers]
+
+        aggregates = self._window_aggregates([plan for plan in pending if plan.intent != "biggest"])
+        biggest = self._biggest_transactions([plan for plan in pending if plan.intent == "biggest"])
+        for plan in pending:
+            if plan.intent == "biggest":
+                answer = self._biggest_purchase_answer(plan.category, plan.time_filter, biggest[plan])
+            else:
+                category_id = self._category_id(plan.category) if plan.intent != "general" else None
+                totals = aggregates[(plan.start, plan.end, plan.period)]
+                selected = totals.values() if category_id is None else [totals.get(category_id, (None, 0))]
+                amounts = [total for total, _ in selected if total is not None]
+                total = sum(amounts) if amounts else None
+                count = sum(count for _, count in selected)
+                if plan.intent == "amount":
+                    answer = self._amount_answer(plan.category, plan.time_filter, total, count)
+                elif plan.intent == "count":
+                    answer = self._count_answer(plan.category, plan.time_filter, count)
+                else:
+                    answer = self._general_answer(plan.category, plan.time_filter, total, count)
+            copilot_cache.put_result((plan, data_version), copy.deepcopy(answer))
+            answers[plan] = answer
+        return [copy.deepcopy(answers[plan]) for plan in plans]
+
+    def _data_version(self) -> Tuple[int, int]:
+        """Versions of the tables copilot answers are computed from."""
+        return (
+            table_versions.get(Transaction.__tablename__),
+            table_versions.get(Category.__tablename__)
+        )
+
+    def plan(self, question: str) -> QueryPlan:
+        """Parse `question` into a QueryPlan, reusing the cached plan for repeated questions."""
+        normalized = ' '.join(question.lower().split())
+        key = (normalized, datetime.now().date(), self.categories.version)
+        return copilot_cache.plan(key, lambda: self._build_plan(normalized))
+
+    def _build_plan(self, question_lower: str) -> QueryPlan:
         # Extract time period
-        time_filter = self._extract_time_period(question_lower)
+        time_filter = self._extract_time_period(question_lower) or {}
         
         # Extract category
         category_filter = self._extract_category(question_lower)
         
         # Determine query type
         if any(word in question_lower for word in ["how much", "total", "spent", "spend"]):
-            return self._handle_amount_query(category_filter, time_filter)
+            intent = "amount"
         elif any(word in question_lower for word in ["biggest", "largest", "highest", "maximum"]):
-            return self._handle_biggest_purchase_query(category_filter, time_filter)
+            intent = "biggest"
         elif any(word in question_lower for word in ["how many", "count", "number"]):
-            return self._handle_count_query(category_filter, time_filter)
+            intent = "count"
         else:
-            return self._handle_general_query(category_filter, time_filter)
+            intent = "general"
+        return QueryPlan(
+            intent, category_filter, time_filter.get("start"), time_filter.get("end"), time_filter.get("period")
+        )
+
+    def execute(self, plan: QueryPlan) -> Dict:
+        """Answer a parsed question against the database."""
+        handler = {
+            "amount": self._handle_amount_query,
+            "biggest": self._handle_biggest_purchase_query,
+            "count": self._handle_count_query,
+            "general": self._handle_general_query,
+        }[plan.intent]
+        return handler(plan.category, plan.time_filter)
     
     def _extract_time_period(self, question: str) -> Optional[Dict]:
         """Extract time period from question."""
@@ -105,18 +1227,14 @@ class CopilotService:
     
     def _extract_category(self, question: str) -> Optional[str]:
         """Extract category from question."""
-        categories = self.db.query(Category).all()
-        
-        for category in categories:
-            if category.name.lower() in question:
-                return category.name
+        for _, name, keywords in self.categories.keywords:
+            if name.lower() in question:
+                return name
             
             # Check keywords too
-            if category.keywords:
-                keywords = [kw.strip().lower() for kw in category.keywords.split(',')]
-                for keyword in keywords:
-                    if keyword in question:
-                        return category.name
+            for keyword in keywords:
+                if keyword in question:
+                    return name
         
         # Common aliases
         aliases = {
@@ -132,14 +1250,13 @@ class CopilotService:
         
         return None
     
-    def _handle_amount_query(self, category_filter: Optional[str], time_filter: Optional[Dict]) -> Dict:
-        """Handle 'how much did I spend' type queries."""
-        query = self.db.query(Transaction)
+    def _filtered_query(self, category_filter: Optional[str], time_filter: Optional[Dict], *entities) -> Query:
+        """Build a query over `entities` (default: Transaction rows) restricted by category and time."""
+        query = self.db.query(*entities) if entities else self.db.query(Transaction)
         
-        if category_filter:
-            category = self.db.query(Category).filter(Category.name == category_filter).first()
-            if category:
-                query = query.filter(Transaction.category_id == category.id)
+        category_id = self._category_id(category_filter)
+        if category_id is not None:
+            query = query.filter(Transaction.category_id == category_id)
         
         if time_filter:
             query = query.filter(
@@ -147,8 +1264,70 @@ class CopilotService:
                 Transaction.date <= time_filter["end"]
             )
         
-        transactions = query.all()
-        total = sum(t.amount for t in transactions)
+        return query
+
+    def _category_id(self, category_filter: Optional[str]) -> Optional[int]:
+        """Id of the named category, or None when the question isn't restricted to a known one."""
+        return self.categories.name_to_id.get(category_filter) if category_filter else None
+
+    @staticmethod
+    def _window_condition(start: Optional[datetime], end: Optional[datetime], period: Optional[str]):
+        if period is None:
+            return true()
+        return and_(Transaction.date >= start, Transaction.date <= end)
+
+    def _window_aggregates(self, plans: List[QueryPlan]) -> Dict[Tuple, Dict[Optional[int], Tuple]]:
+        """Per time window of `plans`, map category id -> (sum, count), all from one query."""
+        windows = list(dict.fromkeys((plan.start, plan.end, plan.period) for plan in plans))
+        if not windows:
+            return {}
+        conditions = [self._window_condition(*window) for window in windows]
+        columns = []
+        for condition in conditions:
+            columns.append(func.sum(case((condition, Transaction.amount))))
+            columns.append(func.count(case((condition, Transaction.id))))
+        query = self.db.query(Transaction.category_id, *columns).group_by(Transaction.category_id)
+        if all(period is not None for _, _, period in windows):
+            query = query.filter(or_(*conditions))
+
+        aggregates = {window: {} for window in windows}
+        for category_id, *values in query:
+            for i, window in enumerate(windows):
+                total, count = values[2 * i], values[2 * i + 1]
+                if count:
+                    aggregates[window][category_id] = (total, count)
+        return aggregates
+
+    def _biggest_transactions(self, plans: List[QueryPlan]) -> Dict[QueryPlan, Optional[Tuple]]:
+        """Largest transaction for each of `plans`, fetched with one UNION ALL query per
+        SQLITE_MAX_COMPOUND_SELECT plans."""
+        if not plans:
+            return {}
+        selects = []
+        for slot, plan in enumerate(plans):
+            query = select(
+                literal(slot).label("slot"), Transaction.amount, Transaction.description, Transaction.date
+            ).where(self._window_condition(plan.start, plan.end, plan.period))
+            category_id = self._category_id(plan.category)
+            if category_id is not None:
+                query = query.where(Transaction.category_id == category_id)
+            selects.append(select(query.order_by(Transaction.amount.desc()).limit(1).subquery()))
+        by_slot = {}
+        for offset in range(0, len(selects), SQLITE_MAX_COMPOUND_SELECT):
+            group = selects[offset:offset + SQLITE_MAX_COMPOUND_SELECT]
+            statement = union_all(*group) if len(group) > 1 else group[0]
+            by_slot.update((row.slot, row) for row in self.db.execute(statement))
+        return {plan: by_slot.get(slot) for slot, plan in enumerate(plans)}
+
+    def _handle_amount_query(self, category_filter: Optional[str], time_filter: Optional[Dict]) -> Dict:
+        """Handle 'how much did I spend' type queries."""
+        total, count = self._filtered_query(
+            category_filter, time_filter, func.sum(Transaction.amount), func.count(Transaction.id)
+        ).one()
+        return self._amount_answer(category_filter, time_filter, total, count)
+
+    def _amount_answer(self, category_filter: Optional[str], time_filter: Optional[Dict], total, count: int) -> Dict:
+        total = total or 0
         
         # Build response
         period_text = f" in {time_filter['period']}" if time_filter else ""
@@ -158,7 +1337,7 @@ class CopilotService:
             "answer": f"You spent ${total:.2f}{category_text}{period_text}.",
             "data": {
                 "total_amount": total,
-                "transaction_count": len(transactions),
+                "transaction_count": count,
                 "category": category_filter,
                 "period": time_filter["period"] if time_filter else None
             }
@@ -166,21 +1345,12 @@ class CopilotService:
     
     def _handle_biggest_purchase_query(self, category_filter: Optional[str], time_filter: Optional[Dict]) -> Dict:
         """Handle 'biggest purchase' type queries."""
-        query = self.db.query(Transaction)
-        
-        if category_filter:
-            category = self.db.query(Category).filter(Category.name == category_filter).first()
-            if category:
-                query = query.filter(Transaction.category_id == category.id)
-        
-        if time_filter:
-            query = query.filter(
-                Transaction.date >= time_filter["start"],
-                Transaction.date <= time_filter["end"]
-            )
+        query = self._filtered_query(category_filter, time_filter)
         
         biggest_transaction = query.order_by(Transaction.amount.desc()).first()
-        
+        return self._biggest_purchase_answer(category_filter, time_filter, biggest_transaction)
+
+    def _biggest_purchase_answer(self, category_filter: Optional[str], time_filter: Optional[Dict], biggest_transaction) -> Dict:
         if biggest_transaction:
             period_text = f" in {time_filter['period']}" if time_filter else ""
             category_text = f" in {category_filter}" if category_filter else ""
@@ -209,21 +1379,10 @@ class CopilotService:
     
     def _handle_count_query(self, category_filter: Optional[str], time_filter: Optional[Dict]) -> Dict:
         """Handle count-based queries."""
-        query = self.db.query(Transaction)
-        
-        if category_filter:
-            category = self.db.query(Category).filter(Category.name == category_filter).first()
-            if category:
-                query = query.filter(Transaction.category_id == category.id)
-        
-        if time_filter:
-            query = query.filter(
-                Transaction.date >= time_filter["start"],
-                Transaction.date <= time_filter["end"]
-            )
-        
-        count = query.count()
-        
+        count = self._filtered_query(category_filter, time_filter, func.count(Transaction.id)).scalar()
+        return self._count_answer(category_filter, time_filter, count)
+
+    def _count_answer(self, category_filter: Optional[str], time_filter: Optional[Dict], count: int) -> Dict:
         period_text = f" in {time_filter['period']}" if time_filter else ""
         category_text = f" {category_filter}" if category_filter else ""
         
@@ -248,20 +1407,18 @@ class CopilotService:
     
     def _handle_general_query(self, category_filter: Optional[str], time_filter: Optional[Dict]) -> Dict:
         """Handle general queries with summary information."""
-        query = self.db.query(Transaction)
-        
-        if time_filter:
-            query = query.filter(
-                Transaction.date >= time_filter["start"],
-                Transaction.date <= time_filter["end"]
-            )
-        
-        transactions = query.all()
-        total = sum(t.amount for t in transactions)
+        # General summaries span all categories; the category is only echoed back
+        total, count = self._filtered_query(
+            None, time_filter, func.sum(Transaction.amount), func.count(Transaction.id)
+        ).one()
+        return self._general_answer(category_filter, time_filter, total, count)
+
+    def _general_answer(self, category_filter: Optional[str], time_filter: Optional[Dict], total, count: int) -> Dict:
+        total = total or 0
         
         period_text = f" in {time_filter['period']}" if time_filter else ""
         
-        if len(transactions) == 0:
+        if count == 0:
             return {
                 "answer": "You have no transactions.",
                 "data": {
@@ -273,10 +1430,10 @@ class CopilotService:
             }
         else:
             return {
-                "answer": f"You had {len(transactions)} transactions totaling ${total:.2f}{period_text}.",
+                "answer": f"You had {count} transactions totaling ${total:.2f}{period_text}.",
                 "data": {
                     "total_amount": total,
-                    "transaction_count": len(transactions),
+                    "transaction_count": count,
                     "period": time_filter["period"] if time_filter else None
                 }
-            } 
\ No newline at end of file
+            }
\ No newline at end of file
@@ -0,0 +1,79 @@
+"""Batch recategorization through PATCH /api/transactions."""
+import pytest
+
+from conftest import assert_rollup_consistent, upload
+from models import SessionLocal, Transaction
+
+GROCERIES, RESTAURANTS, GAS, SHOPPING = 1, 2, 3, 4
+
+@pytest.fixture
+def ids(client):
+    """Upload four transactions and return their ids by description."""
+    content = "\n".join([
+        "date,description,amount",
+        "2024-01-05,WHOLE FOODS,-40.00",
+        "2024-01-20,SHELL,-30.00",
+        "2024-02-03,SHELL,-25.00",
+        "2024-02-10,AMAZON,-60.00",
+    ])
+    assert upload(client, content).status_code == 200
+    rows = client.get("/api/transactions").json()
+    return {(row["description"], row["date"][:7]): row["id"] for row in rows}
+
+def categories():
+    db = SessionLocal()
+    try:
+        return {row.id: row.category_id for row in db.query(Transaction.id, Transaction.category_id)}
+    finally:
+        db.close()
+
+def patch(client, body):
+    return client.patch("/api/transactions", json=body)
+
+def test_changes_report_only_rows_that_moved(client, ids):
+    whole_foods, amazon = ids[("WHOLE FOODS", "2024-01")], ids[("AMAZON", "2024-02")]
+    response = patch(client, {"changes": [
+        {"id": whole_foods, "category_id": RESTAURANTS},
+        {"id": amazon, "category_id": SHOPPING},  # already Shopping
+        {"id": 999999, "category_id": GAS},  # no such transaction
+    ]})
+    assert response.status_code == 200
+    assert response.json() == {"updated_ids": [whole_foods]}
+    assert categories()[whole_foods] == RESTAURANTS
+    assert categories()[amazon] == SHOPPING
+    assert_rollup_consistent()
+
+def test_filter_moves_every_match(client, ids):
+    response = patch(client, {"filter": {"category_id": GAS, "start_date": "2024-02-01T00:00:00"}, "category_id": SHOPPING})
+    assert response.json() == {"updated_ids": [ids[("SHELL", "2024-02")]]}
+    assert categories()[ids[("SHELL", "2024-01")]] == GAS
+    # Matches already in the target category are left out of the result
+    assert patch(client, {"filter": {"min_amount": -30, "max_amount": -25}, "category_id": SHOPPING}).json() == \
+        {"updated_ids": [ids[("SHELL", "2024-01")]]}
+    assert_rollup_consistent()
+
+def test_filter_reaches_uncategorized_rows(client, ids):
+    db = SessionLocal()
+    try:
+        db.query(Transaction).update({Transaction.category_id: None}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    response = patch(client, {"filter": {"description_prefix": "SHELL"}, "category_id": GAS})
+    assert response.json() == {"updated_ids": sorted([ids[("SHELL", "2024-01")], ids[("SHELL", "2024-02")]])}
+
+@pytest.mark.parametrize("body", [
+    {},
+    {"changes": [], "filter": {"category_id": GAS}, "category_id": SHOPPING},
+    {"filter": {}, "category_id": SHOPPING},
+    {"filter": {"category_id": GAS}},
+    {"changes": [{"id": 1, "category_id": 424242}]},
+    {"filter": {"category_id": GAS}, "category_id": 424242},
+])
+def test_malformed_requests_are_refused_without_writing(client, ids, body):
+    before = categories()
+    assert patch(client, body).status_code == 400
+    assert categories() == before
+
+def test_empty_description_prefix_is_invalid(client, ids):
+    assert patch(client, {"filter": {"description_prefix": ""}, "category_id": GAS}).status_code == 422
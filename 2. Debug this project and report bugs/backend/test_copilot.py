@@ -0,0 +1,50 @@
+"""Copilot questions answered one at a time and in batches."""
+from datetime import datetime
+
+from conftest import upload
+from models import Category, SessionLocal, Transaction
+from services import CopilotService
+
+PERIODS = ["last month", "this month", "january", "february", "march", "april", "may", "june", "july",
+           "august", "september", "october", "november", "december"]
+
+def test_batch_answers_match_single_answers(client):
+    upload(client, "date,description,amount\n2024-03-02,Grocery store,-20\n2024-03-03,Coffee shop,-4\n")
+    questions = [
+        "How much did I spend on groceries in march?",
+        "What was my biggest purchase in march?",
+        "How many restaurants transactions in march?",
+        "summary please",
+    ]
+    singles = [client.post("/api/copilot/query", json={"question": q}).json() for q in questions]
+    response = client.post("/api/copilot/batch", json={"questions": questions})
+    assert response.status_code == 200
+    assert response.json()["answers"] == singles
+
+def test_batch_size_is_limited(client):
+    response = client.post("/api/copilot/batch", json={"questions": ["summary please"] * 101})
+    assert response.status_code == 422
+
+def test_biggest_purchase_batch_beyond_sqlite_compound_select_limit(client):
+    # 45 categories x 14 periods = 630 distinct biggest-purchase lookups, more than one UNION ALL may hold
+    db = SessionLocal()
+    names = [f"zeta{i:02d}" for i in range(45)]
+    try:
+        categories = [Category(name=name, keywords="") for name in names]
+        db.add_all(categories)
+        db.flush()
+        march = datetime(datetime.now().year if datetime.now().month >= 3 else datetime.now().year - 1, 3, 10)
+        db.add(Transaction(date=march, description="Piano", amount=-900.0, category_id=categories[-1].id))
+        db.commit()
+
+        questions = [f"What was my biggest purchase at {name} in {period}?" for name in names for period in PERIODS]
+        answers = CopilotService(db).process_batch(questions)
+        assert len(answers) == 630
+        found = [(question, answer["data"]["amount"]) for question, answer in zip(questions, answers)
+                 if answer["data"]["amount"]]
+        assert found == [("What was my biggest purchase at zeta44 in march?", 900.0)]
+    finally:
+        db.query(Transaction).delete()
+        db.query(Category).filter(Category.name.in_(names)).delete()
+        db.commit()
+        db.close()
@@ -0,0 +1,63 @@
+"""Streaming Parquet / Arrow export of transactions."""
+import io
+from datetime import datetime
+
+import pytest
+
+from conftest import SAMPLE_CSV, upload
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+GROCERIES = 1
+
+@pytest.fixture
+def exported(client):
+    with open(SAMPLE_CSV, "rb") as f:
+        assert upload(client, f.read()).status_code == 200
+    return client
+
+def export(client, **params):
+    response = client.get("/api/transactions/export", params=params)
+    assert response.status_code == 200
+    return response
+
+def listed(client, **params):
+    """The list endpoint's rows as export records, in id order."""
+    rows = client.get("/api/transactions", params={"limit": 1000, **params}).json()
+    return sorted(
+        ({
+            "id": row["id"],
+            "date": datetime.fromisoformat(row["date"]),
+            "description": row["description"],
+            "amount": row["amount"],
+            "category_id": row["category_id"],
+            "category": row["category_obj"]["name"] if row["category_obj"] else None,
+        } for row in rows),
+        key=lambda row: row["id"]
+    )
+
+def test_parquet_matches_the_list_endpoint_one_row_group_per_batch(exported):
+    response = export(exported, batch_size=10)
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    assert response.headers["content-disposition"] == 'attachment; filename="transactions.parquet"'
+    parquet = pq.ParquetFile(io.BytesIO(response.content))
+    expected = listed(exported)
+    assert parquet.metadata.num_row_groups == -(-len(expected) // 10)
+    assert parquet.read().to_pylist() == expected
+
+def test_arrow_stream_with_filters(exported):
+    response = export(exported, format="arrow", category_id=GROCERIES, start_date="2023-12-01T00:00:00")
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(response.content).read_all()
+    expected = listed(exported, category_id=GROCERIES, start_date="2023-12-01T00:00:00")
+    assert expected
+    assert table.to_pylist() == expected
+
+def test_empty_export_is_a_valid_file_with_the_schema(exported):
+    table = pq.read_table(io.BytesIO(export(exported, category_id=424242).content))
+    assert table.num_rows == 0
+    assert table.column_names == ["id", "date", "description", "amount", "category_id", "category"]
+
+def test_unknown_format_is_rejected(exported):
+    assert exported.get("/api/transactions/export", params={"format": "csv"}).status_code == 422
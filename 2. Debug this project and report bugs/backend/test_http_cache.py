@@ -0,0 +1,63 @@
+"""Conditional GETs: ETag / Last-Modified validators and 304 answers."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import http_cache
+from conftest import upload
+from models import table_versions
+
+DASHBOARD_TABLES = ("monthly_category_rollups", "categories")
+
+def test_etag_revalidation(client):
+    upload(client, "date,description,amount\n2024-01-01,Book store,-3.00\n")
+    first = client.get("/api/dashboard/summary")
+    etag = first.headers["etag"]
+    assert client.get("/api/dashboard/summary", headers={"If-None-Match": etag}).status_code == 304
+
+    # Every page (query string) has its own ETag
+    page = client.get("/api/transactions?limit=1")
+    assert page.headers["etag"] != client.get("/api/transactions?limit=2").headers["etag"]
+    assert client.get("/api/transactions?limit=1", headers={"If-None-Match": page.headers["etag"]}).status_code == 304
+
+    upload(client, "date,description,amount\n2024-01-02,Book store,-4.00\n")
+    second = client.get("/api/dashboard/summary", headers={"If-None-Match": etag})
+    assert second.status_code == 200
+    assert second.json()["total_transactions"] == 2
+    assert client.get("/api/transactions?limit=1", headers={"If-None-Match": page.headers["etag"]}).status_code == 200
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controls the time http_cache compares Last-Modified against."""
+    state = {"now": datetime.now(timezone.utc)}
+
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return state["now"]
+
+    monkeypatch.setattr(http_cache, "datetime", Clock)
+    return state
+
+def write(at: datetime):
+    """Record a committed write to the dashboard's tables at `at` (aware UTC)."""
+    table_versions.bump(*DASHBOARD_TABLES)
+    for table in DASHBOARD_TABLES:
+        table_versions._modified[table] = at.replace(tzinfo=None)
+
+def test_if_modified_since_alone_never_hides_a_write(client, clock):
+    second = datetime(2024, 6, 1, 12, 0, 0, tzinfo=timezone.utc)
+    write(second + timedelta(milliseconds=200))
+
+    # While the write's second is still running, another write could share its timestamp
+    clock["now"] = second + timedelta(milliseconds=500)
+    assert "last-modified" not in client.get("/api/dashboard/summary").headers
+
+    # Afterwards Last-Modified is rounded up, never earlier than the write
+    clock["now"] = second + timedelta(milliseconds=1500)
+    last_modified = client.get("/api/dashboard/summary").headers["last-modified"]
+    assert last_modified == "Sat, 01 Jun 2024 12:00:01 GMT"
+    assert client.get("/api/dashboard/summary", headers={"If-Modified-Since": last_modified}).status_code == 304
+
+    write(second + timedelta(milliseconds=1700))
+    assert client.get("/api/dashboard/summary", headers={"If-Modified-Since": last_modified}).status_code == 200
@@ -0,0 +1,136 @@
+"""CSV upload ingest: parsing, validation, deduplication and the rollup kept alongside it."""
+import hashlib
+import struct
+from datetime import datetime
+
+import pandas as pd
+
+from conftest import assert_rollup_consistent, upload, wait_for_job
+from models import SessionLocal, Transaction
+from services import DEFAULT_CATEGORY_ID, TransactionIngestService
+
+def test_upload_parses_mixed_utc_offsets(client):
+    # A DST change gives the same file two offsets; rows are stored as naive UTC
+    csv = (
+        "date,description,amount\n"
+        "2024-03-09T10:00:00-05:00,Coffee shop,-4.50\n"
+        "2024-03-11T10:00:00-04:00,Coffee shop,-4.75\n"
+        "2024-03-12,Grocery store,-30.00\n"
+    )
+    response = upload(client, csv)
+    assert response.status_code == 200, response.text
+    assert response.json()["accepted"] == 3
+
+    dates = sorted(t["date"] for t in client.get("/api/transactions?order=asc").json())
+    assert dates == ["2024-03-09T15:00:00", "2024-03-11T14:00:00", "2024-03-12T00:00:00"]
+    summary = client.get("/api/dashboard/summary").json()
+    assert summary["total_transactions"] == 3
+    assert summary["monthly_expenses"] == [{"year": 2024, "month": 3, "total_amount": 39.25}]
+    assert_rollup_consistent()
+
+def test_background_upload_parses_mixed_utc_offsets(client):
+    csv = (
+        "date,description,amount\n"
+        "2024-11-02T09:00:00-04:00,Bus ticket,-2.75\n"
+        "2024-11-04T09:00:00-05:00,Bus ticket,-2.75\n"
+    )
+    response = upload(client, csv, background=True)
+    assert response.status_code == 202, response.text
+    job = wait_for_job(client, response.json()["job_id"])
+    assert job["status"] == "completed", job
+    assert job["rows_accepted"] == 2
+
+def test_rows_without_a_valid_date_or_amount_are_rejected(client):
+    csv = (
+        "date,description,amount\n"
+        "2024-01-05,Book store,-12.00\n"
+        "not a date,Book store,-12.00\n"
+        "2024-01-06,Book store,lots\n"
+    )
+    result = upload(client, csv).json()
+    assert (result["accepted"], result["rejected"]) == (1, 2)
+
+def test_missing_columns_are_rejected(client):
+    response = upload(client, "date,amount\n2024-01-05,-12.00\n")
+    assert response.status_code == 400
+    assert "description" in response.json()["detail"]
+
+
+def test_identical_rows_in_one_file_are_kept_and_a_reupload_is_skipped(client):
+    rows = "2024-02-01,Coffee shop,-3.00\n2024-02-01,Coffee shop,-3.00\n2024-02-02,Coffee shop,-3.00\n"
+    first = upload(client, "date,description,amount\n" + rows).json()
+    assert (first["accepted"], first["duplicates"]) == (3, 0)
+
+    # The same rows in a different file: stored ones are skipped, the new one is added
+    second = upload(client, "date,description,amount\n" + rows + "2024-02-03,Coffee shop,-3.00\n").json()
+    assert (second["accepted"], second["duplicates"]) == (1, 3)
+
+    # Description case and spacing don't make a row new
+    third = upload(client, "date,description,amount\n2024-02-01,  COFFEE   shop ,-3.00\n").json()
+    assert (third["accepted"], third["duplicates"]) == (0, 1)
+
+def test_identical_file_is_refused(client):
+    csv = "date,description,amount\n2024-02-01,Coffee shop,-3.00\n"
+    assert upload(client, csv).status_code == 200
+    assert upload(client, csv, filename="renamed.csv").status_code == 409
+
+def test_streamed_upload_not_sorted_by_date_keeps_every_row(client):
+    # Chunks of 2 rows: 2024-01-01 leaves the stream and comes back with another identical coffee
+    lines = ["2024-01-01,Coffee shop,-3.00"] + [f"2024-01-{day:02d},Book store,-9.00" for day in range(2, 9)]
+    lines += ["2024-01-01,Coffee shop,-3.00"]
+    csv = "date,description,amount\n" + "\n".join(lines) + "\n"
+    result = upload(client, csv, stream=True, chunk_rows=2).json()
+    assert (result["accepted"], result["duplicates"]) == (9, 0)
+
+    # Re-uploading the same rows, streamed or not, reproduces the fingerprints
+    again = upload(client, csv + "\n", stream=True, chunk_rows=3).json()
+    assert (again["accepted"], again["duplicates"]) == (0, 9)
+
+def test_streamed_sorted_upload_matches_one_shot_fingerprints(client):
+    lines = [f"2024-01-{day:02d},Coffee shop,-3.00" for day in range(1, 11) for _ in range(3)]
+    csv = "date,description,amount\n" + "\n".join(lines) + "\n"
+    result = upload(client, csv, stream=True, chunk_rows=4).json()
+    assert (result["accepted"], result["chunks"]) == (30, 8)
+    again = upload(client, csv + "\n").json()
+    assert (again["accepted"], again["duplicates"]) == (0, 30)
+
+def test_fingerprints_are_stable():
+    # Stored fingerprints must not change between releases or library versions
+    db = SessionLocal()
+    try:
+        service = TransactionIngestService(db)
+        frame = pd.DataFrame({
+            "date": pd.to_datetime(["2024-01-15 09:30:00", "2024-01-15 09:30:00"]),
+            "description": ["Coffee Shop", "coffee  shop"],
+            "amount": [-4.5, -4.5],
+        })
+        assert service._fingerprints(frame) == [
+            hashlib.blake2b(_record(1705311000 * 10 ** 9, "coffee shop", -450, 0),
+                            digest_size=16, person=b"txn-fingerprint3").hexdigest(),
+            hashlib.blake2b(_record(1705311000 * 10 ** 9, "coffee shop", -450, 1),
+                            digest_size=16, person=b"txn-fingerprint3").hexdigest(),
+        ]
+    finally:
+        db.close()
+
+def test_backfilled_fingerprints_make_a_reupload_of_older_rows_a_no_op(client):
+    db = SessionLocal()
+    try:
+        # Rows stored before fingerprints existed
+        for day in (1, 1, 2):
+            db.add(Transaction(date=datetime(2023, 5, day), description="Gym membership", amount=-40.0,
+                               category_id=DEFAULT_CATEGORY_ID))
+        db.commit()
+        assert TransactionIngestService(db).backfill_fingerprints() == 3
+        assert db.query(Transaction).filter(Transaction.fingerprint.is_(None)).count() == 0
+    finally:
+        db.close()
+
+    csv = "date,description,amount\n2023-05-01,Gym membership,-40\n2023-05-01,Gym membership,-40\n" \
+          "2023-05-02,Gym membership,-40\n"
+    result = upload(client, csv).json()
+    assert (result["accepted"], result["duplicates"]) == (0, 3)
+
+def _record(date_ns: int, description: str, cents: int, ordinal: int) -> bytes:
+    return (struct.pack("<q", date_ns) + hashlib.blake2b(description.encode(), digest_size=16).digest()
+            + struct.pack("<qq", cents, ordinal))
@@ -0,0 +1,49 @@
+"""Upload handling around ingest: background jobs, spooled files and unreadable uploads."""
+import os
+
+import main
+from conftest import upload, wait_for_job
+
+LATIN1_CSV = "date,description,amount\n2024-01-01,Café,-3.00\n".encode("latin-1")
+
+def spooled_files():
+    return os.listdir(main.UPLOAD_SPOOL_DIR) if os.path.isdir(main.UPLOAD_SPOOL_DIR) else []
+
+def test_background_job_reports_progress_and_removes_its_spooled_file(client):
+    csv = "date,description,amount\n" + "".join(f"2024-01-{day:02d},Book store,-{day}.00\n" for day in range(1, 29))
+    response = upload(client, csv, background=True)
+    assert response.status_code == 202
+    job = wait_for_job(client, response.json()["job_id"])
+    assert job["status"] == "completed", job
+    assert (job["rows_processed"], job["rows_accepted"], job["rows_rejected"]) == (28, 28, 0)
+    assert job["bytes_read"] == job["bytes_total"] == len(csv)
+    assert spooled_files() == []
+    assert client.get("/api/jobs/unknown").status_code == 404
+
+def test_non_utf8_upload_is_rejected(client):
+    for background in (False, True):
+        response = upload(client, LATIN1_CSV, background=background)
+        assert response.status_code == 400, response.text
+        assert "UTF-8" in response.json()["detail"]
+    assert spooled_files() == []
+
+def test_refused_upload_leaves_no_spooled_file(client):
+    csv = "date,description,amount\n2024-01-01,Book store,-3.00\n"
+    assert upload(client, csv).status_code == 200
+    assert upload(client, csv, background=True).status_code == 409
+    assert upload(client, "date,amount\n2024-01-01,-3.00\n", background=True).status_code == 400
+    assert spooled_files() == []
+
+def test_undecodable_bytes_after_the_header(client):
+    # Far enough into the file that the header check doesn't read them
+    csv = ("date,description,amount\n" + "2024-01-01,Book store,-3.00\n" * 40000).encode() \
+        + "2024-01-02,Café,-3\n".encode("latin-1")
+    response = upload(client, csv)
+    assert response.status_code == 400, response.text
+    assert "UTF-8" in response.json()["detail"]
+
+    response = upload(client, csv + b"\n", background=True)
+    job = wait_for_job(client, response.json()["job_id"])
+    assert job["status"] == "failed"
+    assert "UTF-8" in job["error"]
+    assert spooled_files() == []
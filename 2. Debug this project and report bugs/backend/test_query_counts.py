@@ -0,0 +1,56 @@
+"""Pin the number of SQL statements per request so N+1 lazy loads show up as test failures."""
+import pytest
+
+from conftest import SAMPLE_CSV, clear_data, upload
+from http_cache import response_cache
+from services import copilot_cache
+from testing import assert_max_queries, count_queries
+
+@pytest.fixture(scope="module")
+def client(app_client):
+    clear_data()
+    with open(SAMPLE_CSV, "rb") as f:
+        response = upload(app_client, f.read(), filename="sample_transactions.csv")
+    assert response.status_code == 200, response.text
+    yield app_client
+
+@pytest.fixture(autouse=True)
+def cold_caches():
+    # Count the statements of a cache miss, not of a cached response
+    response_cache._bodies.clear()
+    copilot_cache.clear()
+
+def test_list_transactions_loads_categories_in_one_statement(client):
+    with assert_max_queries(1):
+        response = client.get("/api/transactions?limit=100")
+    assert response.status_code == 200
+    transactions = response.json()
+    assert len(transactions) > 1
+    assert all(t["category_obj"] is not None for t in transactions)
+
+def test_search_transactions(client):
+    with assert_max_queries(1):
+        response = client.get("/api/transactions/search?q=coffee")
+    assert response.status_code == 200
+    assert response.json()
+
+def test_update_transaction(client):
+    transaction = client.get("/api/transactions?limit=1").json()[0]
+    new_category = 1 if transaction["category_id"] != 1 else 2
+    with count_queries() as statements:
+        response = client.put(f"/api/transactions/{transaction['id']}", json={"category_id": new_category})
+    assert response.status_code == 200
+    assert response.json()["category_obj"]["id"] == new_category
+    assert len(statements) == 8, statements
+
+def test_dashboard_summary(client):
+    with count_queries() as statements:
+        response = client.get("/api/dashboard/summary")
+    assert response.status_code == 200
+    assert len(statements) == 3, statements
+
+def test_copilot_query(client):
+    with count_queries() as statements:
+        response = client.post("/api/copilot/query", json={"question": "How much did I spend on groceries?"})
+    assert response.status_code == 200
+    assert len(statements) == 1, statements
@@ -0,0 +1,104 @@
+"""Recategorization after category changes, and single-row category updates."""
+import threading
+import time
+
+import pytest
+
+from conftest import assert_rollup_consistent, upload
+from models import Category, SessionLocal, Transaction
+from services import RecategorizationService, RollupService, begin_write
+
+RESTAURANTS, SHOPPING, OTHER = 2, 4, 9
+
+@pytest.fixture
+def add_category():
+    """Create categories on demand; they and their transactions are removed afterwards."""
+    db = SessionLocal()
+    created = []
+
+    def add(name: str, keywords: str) -> int:
+        category = Category(name=name, keywords=keywords)
+        db.add(category)
+        db.commit()
+        created.append(category.id)
+        return category.id
+
+    try:
+        yield add
+    finally:
+        db.query(Transaction).filter(Transaction.category_id.in_(created)).delete()
+        db.query(Category).filter(Category.id.in_(created)).delete()
+        db.commit()
+        db.close()
+
+def categories():
+    db = SessionLocal()
+    try:
+        return {t.description: t.category_id for t in db.query(Transaction)}
+    finally:
+        db.close()
+
+def move(client, description: str, category_id: int):
+    transaction = next(t for t in client.get("/api/transactions").json() if t["description"] == description)
+    assert client.put(f"/api/transactions/{transaction['id']}", json={"category_id": category_id}).status_code == 200
+
+def test_recategorize_moves_matching_rows_and_keeps_manual_ones(client, add_category):
+    upload(client, "date,description,amount\n2024-04-01,Piano lesson,-60\n2024-04-02,Violin lesson,-50\n"
+                   "2024-04-03,Coffee shop,-4\n")
+    # A category assigned by hand without a matching keyword survives recategorization
+    move(client, "Violin lesson", SHOPPING)
+    lessons = add_category("Lessons", "piano")
+
+    report = client.post("/api/transactions/recategorize?dry_run=true").json()
+    assert (report["changed"], report["changes"]) == (1, [{"from": "Other", "to": "Lessons", "count": 1}])
+    assert report["samples"][0]["description"] == "Piano lesson"
+    assert categories()["Piano lesson"] == OTHER
+
+    report = client.post("/api/transactions/recategorize?batch_size=1").json()
+    assert (report["scanned"], report["changed"]) == (3, 1)
+    assert categories() == {"Piano lesson": lessons, "Violin lesson": SHOPPING, "Coffee shop": RESTAURANTS}
+    assert_rollup_consistent()
+
+def test_recategorize_uncategorized_scope(client, add_category):
+    upload(client, "date,description,amount\n2024-04-01,Piano lesson,-60\n2024-04-02,Piano tuner,-90\n")
+    move(client, "Piano tuner", SHOPPING)
+    lessons = add_category("Lessons", "piano")
+
+    # Only rows in "Other" (or without a category) are in scope
+    report = client.post("/api/transactions/recategorize?scope=uncategorized").json()
+    assert (report["scanned"], report["changed"]) == (1, 1)
+    assert categories() == {"Piano lesson": lessons, "Piano tuner": SHOPPING}
+    assert_rollup_consistent()
+
+def test_recategorize_waits_for_a_concurrent_update(client):
+    upload(client, "date,description,amount\n2024-04-01,Coffee shop,-4\n")
+    writer = SessionLocal()
+    try:
+        # Another request moves the row and holds the write lock while recategorization starts
+        begin_write(writer)
+        row = writer.query(Transaction).one()
+        assert row.category_id == RESTAURANTS
+        row.category_id = SHOPPING
+        writer.flush()
+        RollupService(writer).move(row, RESTAURANTS)
+
+        recategorizer = SessionLocal()
+        thread = threading.Thread(target=lambda: RecategorizationService(recategorizer).recategorize())
+        thread.start()
+        time.sleep(0.2)
+        writer.commit()
+        thread.join(10)
+        recategorizer.close()
+    finally:
+        writer.close()
+    # The run saw the committed move and put the coffee back where its keyword says
+    assert categories() == {"Coffee shop": RESTAURANTS}
+    assert_rollup_consistent()
+
+def test_update_transaction_moves_the_rollup(client):
+    upload(client, "date,description,amount\n2024-04-01,Coffee shop,-4\n2024-04-02,Coffee shop,-5\n")
+    transaction = client.get("/api/transactions").json()[0]
+    response = client.put(f"/api/transactions/{transaction['id']}", json={"category_id": SHOPPING})
+    assert response.json()["category_obj"]["name"] == "Shopping"
+    assert_rollup_consistent()
+    assert client.put("/api/transactions/999999", json={"category_id": SHOPPING}).status_code == 404
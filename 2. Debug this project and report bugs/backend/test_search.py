@@ -0,0 +1,62 @@
+"""Full-text search over transaction descriptions."""
+import pytest
+
+from conftest import upload
+from models import SessionLocal, Transaction
+
+@pytest.fixture
+def searchable(client):
+    content = "\n".join([
+        "date,description,amount",
+        "2024-03-01,STARBUCKS COFFEE #1234,-5.25",
+        "2024-03-02,Blue Bottle Coffee,-6.00",
+        "2024-03-03,AT&T Wireless,-80.00",
+        "2024-03-04,Café Réveil,-4.50",
+        "2024-03-05,Starlight Cinema,-15.00",
+    ])
+    assert upload(client, content).status_code == 200
+    return client
+
+def search(client, q, **params):
+    response = client.get("/api/transactions/search", params={"q": q, **params})
+    assert response.status_code == 200
+    return [row["description"] for row in response.json()]
+
+def test_words_match_as_prefixes_case_insensitively(searchable):
+    assert sorted(search(searchable, "coffee")) == ["Blue Bottle Coffee", "STARBUCKS COFFEE #1234"]
+    assert sorted(search(searchable, "star")) == ["STARBUCKS COFFEE #1234", "Starlight Cinema"]
+
+def test_every_word_must_match(searchable):
+    assert search(searchable, "star coffee") == ["STARBUCKS COFFEE #1234"]
+    assert search(searchable, "bottle cinema") == []
+
+def test_punctuation_and_operators_are_literal(searchable):
+    assert search(searchable, "AT&T") == ["AT&T Wireless"]
+    assert search(searchable, "coffee OR cinema") == []
+    assert search(searchable, '"#1234') == ["STARBUCKS COFFEE #1234"]
+    assert search(searchable, "&&") == []
+
+def test_diacritics_are_ignored(searchable):
+    assert search(searchable, "cafe reveil") == ["Café Réveil"]
+
+def test_limit_and_skip(searchable):
+    everything = search(searchable, "s")
+    assert len(everything) == 2
+    assert search(searchable, "s", limit=1) == everything[:1]
+    assert search(searchable, "s", limit=1, skip=1) == everything[1:2]
+
+def test_index_follows_updates_and_deletes(searchable):
+    db = SessionLocal()
+    try:
+        db.query(Transaction).filter(Transaction.description == "Blue Bottle Coffee")\
+            .update({Transaction.description: "Ritual Roasters"}, synchronize_session=False)
+        db.query(Transaction).filter(Transaction.description == "Starlight Cinema").delete()
+        db.commit()
+    finally:
+        db.close()
+    assert search(searchable, "coffee") == ["STARBUCKS COFFEE #1234"]
+    assert search(searchable, "ritual") == ["Ritual Roasters"]
+    assert search(searchable, "cinema") == []
+
+def test_empty_query_is_rejected(searchable):
+    assert searchable.get("/api/transactions/search", params={"q": ""}).status_code == 422
@@ -0,0 +1,106 @@
+"""Listing transactions: keyset pagination, offset paging and the filters."""
+import pytest
+from sqlalchemy import text
+
+from conftest import upload
+from models import SessionLocal, Transaction
+from services import filter_transactions, paginate_transactions
+
+GROCERIES = 1
+
+@pytest.fixture
+def listed(client):
+    """Thirty transactions, two per day with tied dates, alternating groceries and gas."""
+    lines = ["date,description,amount"]
+    for n in range(30):
+        description = "WHOLE FOODS" if n % 2 else "SHELL"
+        lines.append(f"2024-01-{n // 2 + 1:02d},{description} {n},-{n + 1}.00")
+    assert upload(client, "\n".join(lines)).status_code == 200
+    return client
+
+def walk(client, direction="next", **params):
+    """Follow cursors from the first page to the end, returning each page's amounts."""
+    pages = []
+    response = client.get("/api/transactions", params=params)
+    while True:
+        pages.append([row["amount"] for row in response.json()])
+        cursor = response.headers.get(f"x-{direction}-cursor")
+        if cursor is None:
+            return pages, response
+        response = client.get("/api/transactions", params={**params, "cursor": cursor})
+
+def test_cursors_walk_every_row_once_in_order(listed):
+    pages, _ = walk(listed, limit=7)
+    assert [len(page) for page in pages] == [7, 7, 7, 7, 2]
+    amounts = [amount for page in pages for amount in page]
+    # Newest first; rows sharing a date come back highest id first
+    assert amounts == [-float(n) for n in range(30, 0, -1)]
+
+def test_prev_cursor_returns_the_previous_page(listed):
+    first = listed.get("/api/transactions", params={"limit": 7})
+    assert "x-prev-cursor" not in first.headers
+    second = listed.get("/api/transactions", params={"limit": 7, "cursor": first.headers["x-next-cursor"]})
+    back = listed.get("/api/transactions", params={"limit": 7, "cursor": second.headers["x-prev-cursor"]})
+    assert back.json() == first.json()
+    assert "x-prev-cursor" not in back.headers
+
+def test_ascending_order(listed):
+    pages, _ = walk(listed, limit=10, order="asc")
+    assert [amount for page in pages for amount in page] == [-float(n) for n in range(1, 31)]
+
+def test_skip_pages_by_offset(listed):
+    response = listed.get("/api/transactions", params={"limit": 5, "skip": 10})
+    assert response.status_code == 200
+    assert [row["amount"] for row in response.json()] == [-20.0, -19.0, -18.0, -17.0, -16.0]
+    assert "x-prev-cursor" in response.headers
+
+def test_filters_combine_with_pagination(listed):
+    pages, _ = walk(listed, limit=4, category_id=GROCERIES, min_amount=-20, max_amount=-5)
+    amounts = [amount for page in pages for amount in page]
+    assert amounts == [-20.0, -18.0, -16.0, -14.0, -12.0, -10.0, -8.0, -6.0]
+    rows = listed.get("/api/transactions", params={"category_id": GROCERIES, "min_amount": -20, "max_amount": -5}).json()
+    assert all(row["category_id"] == GROCERIES and -20 <= row["amount"] <= -5 for row in rows)
+    assert all(row["category_obj"]["name"] == "Groceries" for row in rows)
+
+def test_date_range_and_description_prefix(listed):
+    rows = listed.get("/api/transactions", params={
+        "start_date": "2024-01-03T00:00:00", "end_date": "2024-01-04T00:00:00"
+    }).json()
+    assert sorted(row["amount"] for row in rows) == [-8.0, -7.0, -6.0, -5.0]
+    rows = listed.get("/api/transactions", params={"description_prefix": "SHELL 2"}).json()
+    assert sorted(row["description"] for row in rows) == ["SHELL 2", "SHELL 20", "SHELL 22", "SHELL 24", "SHELL 26", "SHELL 28"]
+
+def test_bad_parameters_are_rejected(listed):
+    assert listed.get("/api/transactions", params={"cursor": "not-a-cursor"}).status_code == 400
+    assert listed.get("/api/transactions", params={"description_prefix": ""}).status_code == 422
+
+def test_amount_range_is_served_by_the_amount_index(listed):
+    db = SessionLocal()
+    try:
+        query = filter_transactions(db.query(Transaction), min_amount=-20, max_amount=-5)
+        ids = query.with_entities(Transaction.id).order_by(Transaction.date.desc(), Transaction.id.desc())
+        compiled = ids.statement.compile(db.bind, compile_kwargs={"literal_binds": True})
+        plan = " ".join(row[3] for row in db.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+        assert "ix_transactions_amount_date" in plan
+        rows, _, _ = paginate_transactions(query, limit=100)
+        assert sorted(row.amount for row in rows) == [-float(n) for n in range(20, 4, -1)]
+    finally:
+        db.close()
+
+def test_rows_carry_their_category_and_uncategorized_rows_are_kept(listed):
+    db = SessionLocal()
+    try:
+        uncategorized = db.query(Transaction).filter(Transaction.description == "SHELL 0").one()
+        uncategorized.category_id = None
+        db.commit()
+        uncategorized_id = uncategorized.id
+    finally:
+        db.close()
+    categories = {category["id"]: category for category in listed.get("/api/categories").json()}
+    rows = listed.get("/api/transactions").json()
+    assert len(rows) == 30
+    for row in rows:
+        if row["id"] == uncategorized_id:
+            assert row["category_id"] is None and row["category_obj"] is None
+        else:
+            assert row["category_obj"] == categories[row["category_id"]]
@@ -0,0 +1,36 @@
+"""Helpers for tests and benchmarks that exercise the API against a real database."""
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from models import engine
+
+@contextmanager
+def count_queries(bind: Engine = engine) -> Iterator[List[str]]:
+    """Collect every SQL statement executed on `bind` inside the block."""
+    statements: List[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(bind, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, "before_cursor_execute", record)
+
+@contextmanager
+def assert_max_queries(limit: int, bind: Engine = engine) -> Iterator[List[str]]:
+    """Fail if the block executes more than `limit` SQL statements, e.g. because of N+1 lazy loads.
+
+    Usage:
+        with assert_max_queries(2):
+            client.get("/api/transactions")
+    """
+    with count_queries(bind) as statements:
+        yield statements
+    if len(statements) > limit:
+        listing = "\n".join(f"  {i + 1}. {statement}" for i, statement in enumerate(statements))
+        raise AssertionError(f"Expected at most {limit} SQL statements, got {len(statements)}:\n{listing}")
@@ -27,12 +27,12 @@ const AppContent: React.FC = () => {
   const loadData = async () => {
     setLoading(true);
     try {
-      const [transactionsData, summaryData] = await Promise.all([
+      const [transactionsPage, summaryData] = await Promise.all([
         apiService.getTransactions(),
         apiService.getDashboardSummary()
       ]);
       
-      setTransactions(transactionsData);
+      setTransactions(transactionsPage.items);
       setDashboardSummary(summaryData);
     } catch (error) {
       console.error('Error loading data:', error);
@@ -1,5 +1,6 @@
 import React, { useState } from 'react';
 import { apiService } from '../services/api';
+import { UploadJob } from '../types';
 
 interface FileUploadProps {
   onUploadSuccess: () => void;
@@ -18,6 +19,18 @@ const FileUpload: React.FC<FileUploadProps> = ({ onUploadSuccess }) => {
     }
   };
 
+  // Uploads are processed as background jobs; poll until the job finishes
+  const waitForJob = async (jobId: string): Promise<UploadJob> => {
+    for (;;) {
+      const job = await apiService.getUploadJob(jobId);
+      if (job.status === 'completed' || job.status === 'failed') {
+        return job;
+      }
+      setMessage(`Processing... ${job.rows_processed.toLocaleString()} rows`);
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+    }
+  };
+
   const handleUpload = async () => {
     if (!file) {
       setMessage('Please select a file first');
@@ -29,7 +42,12 @@ const FileUpload: React.FC<FileUploadProps> = ({ onUploadSuccess }) => {
 
     try {
       const response = await apiService.uploadCSV(file);
-      setMessage(response.data.message);
+      const job = await waitForJob(response.data.job_id);
+      if (job.status === 'failed') {
+        setMessage(job.error || 'Upload failed');
+        return;
+      }
+      setMessage(job.message || 'Upload complete');
       setFile(null);
       onUploadSuccess();
       
@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { Transaction, Category, DashboardSummary, CopilotResponse } from '../types';
+import { Transaction, Category, DashboardSummary, CopilotResponse, UploadJob, TransactionPage } from '../types';
 
 // Use environment variable for API URL, fallback to localhost for development
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
@@ -60,17 +60,43 @@ export const apiService = {
     });
   },
 
-  // Transactions
-  getTransactions: async (params?: { skip?: number; limit?: number; category_id?: number }) => {
-    const response = await apiClient.get('/api/transactions', { params });
+  // Background upload jobs
+  getUploadJob: async (jobId: string): Promise<UploadJob> => {
+    const response = await apiClient.get(`/api/jobs/${jobId}`);
     return response.data;
   },
 
+  // Transactions
+  getTransactions: async (params?: {
+    skip?: number;
+    limit?: number;
+    category_id?: number;
+    cursor?: string;
+    start_date?: string;
+    end_date?: string;
+    min_amount?: number;
+    max_amount?: number;
+    description_prefix?: string;
+    order?: 'asc' | 'desc';
+  }): Promise<TransactionPage> => {
+    const response = await apiClient.get<Transaction[]>('/api/transactions', { params });
+    return {
+      items: response.data,
+      nextCursor: response.headers['x-next-cursor'] ?? null,
+      prevCursor: response.headers['x-prev-cursor'] ?? null,
+    };
+  },
+
   updateTransaction: async (id: number, data: { category_id: number }) => {
     const response = await apiClient.put(`/api/transactions/${id}`, data);
     return response.data;
   },
 
+  updateTransactions: async (changes: { id: number; category_id: number }[]): Promise<{ updated_ids: number[] }> => {
+    const response = await apiClient.patch('/api/transactions', { changes });
+    return response.data;
+  },
+
   // Categories
   getCategories: async (): Promise<Category[]> => {
     const response = await apiClient.get('/api/categories');
@@ -35,4 +35,27 @@ export interface MonthlyExpense {
 export interface CopilotResponse {
   answer: string;
   data?: any;
-} 
\ No newline at end of file
+} 
+export interface TransactionPage {
+  items: Transaction[];
+  // Opaque cursors from the X-Next-Cursor / X-Prev-Cursor headers; null at either end
+  nextCursor: string | null;
+  prevCursor: string | null;
+}
+
+export interface UploadJob {
+  job_id: string;
+  filename: string;
+  status: 'queued' | 'running' | 'completed' | 'failed';
+  rows_processed: number;
+  rows_accepted: number;
+  rows_rejected: number;
+  rows_duplicate: number;
+  bytes_read: number;
+  bytes_total: number;
+  rows_per_second: number;
+  elapsed_seconds: number;
+  eta_seconds: number | null;
+  error: string | null;
+  message?: string;
+}